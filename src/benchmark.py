@@ -0,0 +1,262 @@
+from loguru import logger
+import ssp_content_creator
+from ssp_content_creator import oscal, insert_controls, configure_logging, generate_ssp
+from catalog_index import CatalogIndex
+from synthetic_catalog import synthetic_catalog, write_synthetic_catalog
+from oscal_backends import get_backend
+from metrics import metrics, max_rss_bytes
+from common import *
+import argparse
+import concurrent.futures
+import multiprocessing
+import json
+import os
+import sys
+import tempfile
+import time
+
+base_ssp_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fedramp-ssp-example_base.oscal.xml")
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# LOGGING OVERHEAD
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def logging_configurations(log_dir):
+    """
+    Returns (name, setup) pairs. "debug" is the configuration every run used
+    to get: loguru's DEBUG console sink plus a DEBUG file sink with enqueue=True
+    (the console is sent to os.devnull here). The others use configure_logging.
+    """
+    def debug():
+        logger.remove()
+        logger.add(open(os.devnull, mode='w'), level="DEBUG")
+        logger.add(os.path.join(log_dir, "debug_{time}.log"), level="DEBUG", enqueue=True)
+
+    def level(name):
+        return lambda: configure_logging(name, os.path.join(log_dir, name.lower() + "_{time}.log"))
+
+    return [("debug", debug), ("info", level("INFO")), ("warning", level("WARNING"))]
+
+
+def bench_logging(controls=1000, repeat=3, base_ssp_file=base_ssp_file):
+    """
+    Times insert_controls for every control of a synthetic catalog under each
+    logging configuration and reports the best per-control cost.
+
+    Returns:
+    - dict of results keyed by configuration name
+    """
+    catalog_index = CatalogIndex.from_oscal(oscal(synthetic_catalog(controls)))
+    base_ssp = normalize_content(get_file(base_ssp_file))
+    control_limit = ssp_content_creator.control_limit
+    ssp_content_creator.control_limit = None
+    ret_value = {}
+    try:
+        with tempfile.TemporaryDirectory() as log_dir:
+            for name, setup in logging_configurations(log_dir):
+                setup()
+                timings = []
+                for _ in range(repeat):
+                    ssp_obj = oscal(base_ssp)
+                    start = time.perf_counter()
+                    insert_controls(catalog_index, ssp_obj)
+                    logger.complete()   # include the time to drain enqueued records
+                    timings.append(time.perf_counter() - start)
+                best = min(timings)
+                ret_value[name] = {"controls": len(catalog_index), "seconds": round(best, 6),
+                                   "microseconds_per_control": round(best / len(catalog_index) * 1000000, 2)}
+                logger.remove()
+    finally:
+        ssp_content_creator.control_limit = control_limit
+
+    return ret_value
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# PIPELINE
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def _run_pipeline_case(case):
+    # Runs in a fresh process so that max_rss_bytes is the peak of this case alone
+    configure_logging("WARNING", log_file=None, replace_default=True)
+    ssp_content_creator.control_limit = None
+    ssp_content_creator.skipped_controls = []
+    metrics.start()
+    start = time.perf_counter()
+    status = generate_ssp(case["catalog"], case["base_ssp"], case["output"], stream=case["stream"], backend=case["backend"]) is not None
+    seconds = time.perf_counter() - start
+    metrics.stop()
+    report = metrics.report()
+    controls = report["counters"].get("controls_processed", 0)
+    return {"status": status, "seconds": round(seconds, 6), "controls": controls,
+            "controls_per_second": round(controls / seconds, 1) if seconds > 0 else 0,
+            "microseconds_per_control": round(seconds / controls * 1000000, 2) if controls else None,
+            "bytes_written": report["counters"].get("bytes_written", 0),
+            "max_rss_bytes": max_rss_bytes(),
+            "phases": dict([(name, record["seconds"]) for (name, record) in report["phases"].items()])}
+
+
+def available_backends(names):
+    """
+    Returns the backends in names whose libraries can be imported here.
+    """
+    ret_value = []
+    for name in names:
+        try:
+            get_backend(name)
+            ret_value.append(name)
+        except ImportError as error:
+            logger.warning("Skipping the " + name + " backend: " + str(error))
+    return ret_value
+
+
+def write_base_ssp_json(file_name):
+    """
+    Writes a minimal OSCAL JSON base SSP for the JSON output benchmark.
+    """
+    document = {"system-security-plan": {
+        "uuid": uuid_format(0),
+        "metadata": {"title": "Benchmark Base SSP", "last-modified": "2024-01-01T00:00:00Z", "version": "1.0", "oscal-version": "1.1.2"},
+        "import-profile": {"href": "#"},
+        "system-characteristics": {"system-ids": [{"id": "benchmark"}], "system-name": "Benchmark", "description": "Benchmark system",
+                                   "security-sensitivity-level": "high", "system-information": {"information-types": []},
+                                   "status": {"state": "operational"}, "authorization-boundary": {"description": "Benchmark boundary"}},
+        "system-implementation": {"users": [], "components": [{"uuid": ssp_content_creator.this_system_uuid, "type": "this-system",
+                                                               "title": "This System", "description": "This system",
+                                                               "status": {"state": "operational"}}]},
+        "control-implementation": {"description": "Benchmark controls", "implemented-requirements": []}}}
+    putfile(file_name, json.dumps(document, indent=2))
+
+
+def bench_pipeline(sizes=[100, 1000, 10000], backends=["stdlib"], stream=False, enhancements=0, params=2, response_points=3,
+                   repeat=1, base_ssp_file=base_ssp_file, work_dir=None, json_output=False, json_catalog=False):
+    """
+    Runs the full generate-and-serialize pipeline, offline, on synthetic
+    catalogs of each size with each backend (and the streaming mode when
+    requested). Each run happens in a fresh process, so peak RSS is per run.
+
+    Parameters:
+    - sizes (list)[optional]: Numbers of base controls
+    - backends (list)[optional]: Backend names; those that are not installed are skipped
+    - stream (bool)[optional]: Also run the streaming mode
+    - json_output (bool)[optional]: Also run the JSON output mode (with a minimal JSON base SSP)
+    - json_catalog (bool)[optional]: Also run with the catalog in OSCAL JSON (stdlib, and streaming when stream is set)
+    - enhancements, params, response_points (int)[optional]: The shape of each control (see write_synthetic_catalog)
+    - repeat (int)[optional]: Runs per case; the fastest is reported
+    - base_ssp_file (str)[optional]: The base SSP file
+    - work_dir (str)[optional]: Directory for the catalogs and output (default: a temporary directory)
+
+    Returns:
+    - list of result dicts, one per (size, mode) case
+    """
+    ret_value = []
+    modes = [(backend, False) for backend in available_backends(backends)]
+    if stream:
+        modes.append(("stdlib", True))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_dir = work_dir or temp_dir
+        if json_catalog:
+            modes.append(("json-catalog", False))
+            if stream:
+                modes.append(("json-catalog", True))
+        if json_output:
+            modes.append(("json", False))
+            base_ssp_json = os.path.join(work_dir, "base_ssp.json")
+            write_base_ssp_json(base_ssp_json)
+        context = multiprocessing.get_context("spawn")
+        for size in sizes:
+            catalog_file = os.path.join(work_dir, "catalog_" + str(size) + ".xml")
+            total_controls = write_synthetic_catalog(catalog_file, size, enhancements, params, response_points)
+            if json_catalog:
+                json_catalog_file = os.path.join(work_dir, "catalog_" + str(size) + ".json")
+                write_synthetic_catalog(json_catalog_file, size, enhancements, params, response_points, catalog_format="json")
+            for (backend, streaming) in modes:
+                case = {"catalog": catalog_file, "base_ssp": base_ssp_file, "backend": backend, "stream": streaming,
+                        "output": os.path.join(work_dir, "ssp_" + str(size) + "_" + ("stream" if streaming else backend) + ".xml")}
+                if backend == "json":
+                    case.update(backend="stdlib", base_ssp=base_ssp_json, output=os.path.join(work_dir, "ssp_" + str(size) + ".json"))
+                elif backend == "json-catalog":
+                    case.update(backend="stdlib", catalog=json_catalog_file)
+                runs = []
+                for _ in range(repeat):
+                    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                        runs.append(pool.submit(_run_pipeline_case, case).result())
+                result = min(runs, key=lambda run: run["seconds"])
+                result = dict({"size": size, "catalog_controls": total_controls,
+                               "mode": ("stream" if backend == "stdlib" else backend + "-stream") if streaming else backend}, **result)
+                result["max_rss_bytes"] = max([run["max_rss_bytes"] or 0 for run in runs]) or None
+                logger.info(result["mode"] + " " + str(size) + ": " + str(result["microseconds_per_control"]) + " us/control")
+                ret_value.append(result)
+
+    return ret_value
+
+
+def compare_results(results, baseline, tolerance=0.2):
+    """
+    Compares pipeline results with a baseline (results from an earlier run).
+    A case regresses when its per-control latency or peak RSS is more than
+    tolerance (a fraction) above the baseline's.
+
+    Returns:
+    - list of regression descriptions (empty if there are none)
+    """
+    ret_value = []
+    previous = dict([((result["size"], result["mode"]), result) for result in baseline])
+    for result in results:
+        before = previous.get((result["size"], result["mode"]))
+        if before is None:
+            continue
+        for key in ["microseconds_per_control", "max_rss_bytes"]:
+            if before.get(key) and result.get(key) and result[key] > before[key] * (1 + tolerance):
+                ret_value.append(result["mode"] + " " + str(result["size"]) + ": " + key + " "
+                                 + str(before[key]) + " -> " + str(result[key]))
+
+    return ret_value
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the OSCAL content generator.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    pipeline = subparsers.add_parser("pipeline", help="Full generate-and-serialize runs on synthetic catalogs")
+    pipeline.add_argument("--sizes", default="100,1000,10000", help="Comma separated numbers of base controls (default: %(default)s)")
+    pipeline.add_argument("--backends", default="stdlib,lxml,saxon", help="Comma separated backends (default: %(default)s)")
+    pipeline.add_argument("--stream", action="store_true", help="Also run the streaming mode")
+    pipeline.add_argument("--json", action="store_true", help="Also run the JSON output mode")
+    pipeline.add_argument("--json-catalog", action="store_true", help="Also run with the catalog in OSCAL JSON")
+    pipeline.add_argument("--enhancements", type=int, default=0, help="Enhancements per base control (default: %(default)s)")
+    pipeline.add_argument("--params", type=int, default=2, help="Params per control (default: %(default)s)")
+    pipeline.add_argument("--response-points", type=int, default=3, help="Response points per control (default: %(default)s)")
+    pipeline.add_argument("--repeat", type=int, default=1, help="Runs per case; the fastest is reported (default: %(default)s)")
+    pipeline.add_argument("--output", metavar="FILE", help="Write the results as JSON to FILE")
+    pipeline.add_argument("--baseline", metavar="FILE", help="Results of an earlier run; exit with 1 if any case regressed")
+    pipeline.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression as a fraction (default: %(default)s)")
+    logging = subparsers.add_parser("logging", help="Per-control cost under DEBUG, INFO and WARNING logging")
+    logging.add_argument("--controls", type=int, default=1000, help="Controls in the synthetic catalog (default: %(default)s)")
+    logging.add_argument("--repeat", type=int, default=3, help="Runs per configuration; the best is reported (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.benchmark == "logging":
+        configure_logging("WARNING", log_file=None, replace_default=True)
+        print(json.dumps(bench_logging(args.controls, args.repeat), indent=2))
+        return 0
+
+    configure_logging("INFO", log_file=None, replace_default=True)
+    results = bench_pipeline([int(size) for size in args.sizes.split(",")], args.backends.split(","), args.stream,
+                             args.enhancements, args.params, args.response_points, args.repeat, json_output=args.json,
+                             json_catalog=args.json_catalog)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        putfile(args.output, json.dumps(results, indent=2))
+    status = all([result["status"] for result in results])
+    if args.baseline:
+        with open(args.baseline, mode='r', encoding='utf-8') as file:
+            regressions = compare_results(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            logger.error("REGRESSION: " + regression)
+        status = status and not regressions
+    return 0 if status else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
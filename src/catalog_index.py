@@ -0,0 +1,454 @@
+from loguru import logger
+from common import *
+from metrics import metrics
+from xml.etree import ElementTree
+import hashlib
+import importlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import zlib
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# CATALOG INDEX
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+class ControlEntry:
+    """
+Control Entry Class
+
+The pre-computed information about a single control or control enhancement.
+
+Properties:
+- id: The control id
+- params: A list of the ids of the control's own param children
+- response_points: A list of the ids of the statement parts flagged with
+  the FedRAMP response-point property, in document order
+- parent: The id of the parent control (None for a base control)
+- children: A list of the ids of the control's enhancements
+    """
+    __slots__ = ("id", "params", "response_points", "parent", "children")
+
+    def __init__(self, control_id, parent=None):
+        self.id = control_id
+        self.params = []
+        self.response_points = []
+        self.parent = parent
+        self.children = []
+
+
+def control_entry(element, parent=None, namespace=OSCAL_DEFAULT_NAMESPACE):
+    """
+    Builds the ControlEntry for a control element from its direct children.
+    Child controls (enhancements) are not visited.
+
+    Parameters:
+    - element (obj): The control element
+    - parent (str)[optional]: The id of the parent control
+    - namespace (str)[optional]: The namespace of the catalog elements
+
+    Returns:
+    - ControlEntry
+    """
+    ns = "{" + namespace + "}" if namespace else ""
+    entry = ControlEntry(element.get("id", "").strip(), parent)
+    for child in element:
+        if child.tag == ns + "param":
+            entry.params.append(child.get("id"))
+        elif child.tag == ns + "part" and child.get("name") == "statement":
+            _response_points(child, entry.response_points, ns)
+
+    return entry
+
+
+def _response_points(part, response_points, ns):
+    # Equivalent to ./part[@name='statement']//prop[@name='response-point' and @ns='...']/../@id
+    if part.get("id") is not None:
+        for child in part:
+            if child.tag == ns + "prop" and child.get("name") == "response-point" and child.get("ns") == FEDRAMP_NAMESPACE:
+                response_points.append(part.get("id"))
+                break
+    for child in part:
+        if child.tag == ns + "part":
+            _response_points(child, response_points, ns)
+
+
+class CatalogIndex:
+    """
+Catalog Index Class
+
+Built with a single traversal of a catalog tree. Only the branches that can
+contain controls or control data (groups, controls, params and statement
+parts) are visited.
+
+Properties:
+- controls: A dict of ControlEntry objects keyed by control id
+- order: A list of control ids in document order (the order of //control)
+- oscal_model: The OSCAL model name of the source (when known)
+- oscal_version: The OSCAL version of the source (when known)
+
+Iterating the index yields the ControlEntry objects in document order.
+    """
+    def __init__(self, root=None, namespace=OSCAL_DEFAULT_NAMESPACE):
+        self.controls = {}
+        self.order = []
+        self.oscal_model = ""
+        self.oscal_version = ""
+        self.__namespace = namespace
+        self.__ns = "{" + namespace + "}" if namespace else ""
+
+        if root is not None:
+            self.__walk(root, None)
+            logger.debug("CATALOG INDEX: {} controls", len(self.order))
+
+    @classmethod
+    def from_oscal(cls, catalog_obj):
+        with metrics.phase("index"):
+            index = cls.__from_oscal(catalog_obj)
+            metrics.count("controls_indexed", len(index))
+        return index
+
+    @classmethod
+    def __from_oscal(cls, catalog_obj):
+        if catalog_obj.oscal_format == "json":
+            # JSON catalogs are indexed while they are parsed
+            return catalog_obj.catalog_index
+        if hasattr(catalog_obj.backend, "control_rows"):
+            # Backends without an element API (saxon) compute the rows with a single query
+            index = cls.from_rows(catalog_obj.backend.control_rows(catalog_obj.tree, catalog_obj.nsmap))
+        else:
+            index = cls(catalog_obj.tree, catalog_obj.nsmap.get(""))
+        index.oscal_model = catalog_obj.oscal_model
+        index.oscal_version = catalog_obj.oscal_version
+        return index
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Builds an index from (id, param ids, response-point ids, parent id) rows
+        in document order. Children are derived from the parent ids.
+        """
+        index = cls()
+        for (control_id, params, response_points, parent) in rows:
+            entry = ControlEntry(control_id, parent)
+            entry.params = list(params)
+            entry.response_points = list(response_points)
+            if parent in index.controls:
+                index.controls[parent].children.append(control_id)
+            index.add(entry)
+        return index
+
+    @classmethod
+    def from_json(cls, source, info=None):
+        """
+        Builds an index while reading an OSCAL JSON catalog incrementally
+        (see iter_json_controls).
+        """
+        info = info if info is not None else {}
+        index = cls()
+        for entry in iter_json_controls(source, info):
+            index.add(entry)
+        index.oscal_model = info.get("oscal_model", "")
+        index.oscal_version = info.get("oscal_version", "")
+        return index
+
+    def add(self, entry):
+        self.controls[entry.id] = entry
+        self.order.append(entry.id)
+
+    def __walk(self, node, parent):
+        for child in node:
+            if child.tag == self.__ns + "control":
+                entry = control_entry(child, parent.id if parent is not None else None, self.__namespace)
+                if parent is not None:
+                    parent.children.append(entry.id)
+                self.add(entry)
+                self.__walk(child, entry)
+            elif parent is None and child.tag == self.__ns + "group":
+                self.__walk(child, None)
+
+    def __iter__(self):
+        for control_id in self.order:
+            yield self.controls[control_id]
+
+    def __len__(self):
+        return len(self.order)
+
+    def __contains__(self, control_id):
+        return control_id in self.controls
+
+    def get(self, control_id):
+        return self.controls.get(control_id)
+
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# CATALOG SNAPSHOTS
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+class CatalogSnapshots:
+    """
+Catalog Snapshots Class
+
+Persists CatalogIndex objects as zlib-compressed JSON snapshots so later runs
+can skip parsing the catalog XML. Plain data only, so a snapshot planted in the
+directory cannot run code when it is loaded. Snapshots are named by the SHA-256 of the
+catalog content, so a changed catalog never matches an old snapshot.
+Only the most recently used snapshots are kept.
+
+Properties:
+- snapshot_dir: The directory holding the snapshots
+- keep: The number of snapshots to keep
+    """
+    SNAPSHOT_VERSION = 2
+
+    def __init__(self, snapshot_dir, keep=8):
+        self.snapshot_dir = snapshot_dir
+        self.keep = keep
+        os.makedirs(snapshot_dir, exist_ok=True)
+
+    def __snapshot_file(self, content):
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        digest = hashlib.sha256(content).hexdigest()
+        return os.path.join(self.snapshot_dir, digest + ".v" + str(self.SNAPSHOT_VERSION) + ".snapshot")
+
+    def load(self, content):
+        """
+        Returns the CatalogIndex for the catalog content or None if there is
+        no usable snapshot.
+        """
+        with metrics.phase("snapshot"):
+            return self.__load(content)
+
+    def __load(self, content):
+        ret_value = None
+        snapshot_file = self.__snapshot_file(content)
+        try:
+            with open(snapshot_file, mode='rb') as file:
+                data = json.loads(zlib.decompress(file.read()).decode("utf-8"))
+            if data["version"] == self.SNAPSHOT_VERSION:
+                ret_value = CatalogIndex()
+                ret_value.oscal_model = data["oscal_model"]
+                ret_value.oscal_version = data["oscal_version"]
+                for (control_id, params, response_points, parent, children) in data["controls"]:
+                    entry = ControlEntry(control_id, parent)
+                    entry.params = params
+                    entry.response_points = response_points
+                    entry.children = children
+                    ret_value.add(entry)
+                os.utime(snapshot_file)
+                logger.debug("SNAPSHOT: Loaded {}", snapshot_file)
+        except FileNotFoundError:
+            logger.debug("SNAPSHOT: None for this catalog content")
+        except (Exception, BaseException) as error:
+            logger.warning("SNAPSHOT: Ignoring unreadable snapshot " + snapshot_file + " (" + type(error).__name__ + ") " + str(error))
+
+        return ret_value
+
+    def save(self, content, catalog_index):
+        status = False
+        snapshot_file = self.__snapshot_file(content)
+        data = {"version": self.SNAPSHOT_VERSION,
+                "oscal_model": catalog_index.oscal_model,
+                "oscal_version": catalog_index.oscal_version,
+                "controls": [(entry.id, entry.params, entry.response_points, entry.parent, entry.children) for entry in catalog_index]}
+        try:
+            temp_file = snapshot_file + "." + str(os.getpid()) + ".tmp"
+            with open(temp_file, mode='wb') as file:
+                file.write(zlib.compress(json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")))
+            os.replace(temp_file, snapshot_file)
+            status = True
+            logger.debug("SNAPSHOT: Saved {}", snapshot_file)
+        except (Exception, BaseException) as error:
+            logger.error("SNAPSHOT: Unable to save " + snapshot_file + " (" + type(error).__name__ + ") " + str(error))
+
+        self.prune()
+        return status
+
+    def prune(self):
+        snapshots = [os.path.join(self.snapshot_dir, name) for name in os.listdir(self.snapshot_dir) if name.endswith(".snapshot")]
+        snapshots.sort(key=os.path.getmtime, reverse=True)
+        for snapshot_file in snapshots[self.keep:]:
+            logger.debug("SNAPSHOT: Removing {}", snapshot_file)
+            os.remove(snapshot_file)
+
+
+def iter_controls(source, namespace=OSCAL_DEFAULT_NAMESPACE):
+    """
+    Reads a catalog incrementally and yields a ControlEntry for each control
+    in document order (the order of //control) without building the whole tree.
+
+    A control is yielded as soon as its own params and parts have been read:
+    either when its first enhancement starts or when the control ends.
+    Finished controls and groups are removed from the partial tree, so memory
+    stays roughly constant regardless of catalog size. Because a control is
+    yielded before its enhancements are read, its children list is only
+    complete once the generator has moved past them.
+
+    Parameters:
+    - source (str or obj): A file name or a file object opened for reading
+    - namespace (str)[optional]: The namespace of the catalog elements
+
+    Returns:
+    - generator of ControlEntry
+    """
+    ns = "{" + namespace + "}" if namespace else ""
+    elements = []   # the chain of open elements
+    controls = []   # [element, entry] for each open control; entry is None until yielded
+
+    for event, element in ElementTree.iterparse(source, events=("start", "end")):
+        if event == "start":
+            if element.tag == ns + "control":
+                if controls and controls[-1][1] is None:
+                    yield _open_control(controls, namespace)
+                controls.append([element, None])
+            elif not elements and element.tag != ns + "catalog":
+                logger.error("ROOT ELEMENT IS NOT AN OSCAL CATALOG: " + element.tag)
+                return
+            elements.append(element)
+        else:
+            elements.pop()
+            if element.tag == ns + "control":
+                if controls[-1][1] is None:
+                    yield _open_control(controls, namespace)
+                controls.pop()
+                elements[-1].remove(element)
+            elif element.tag == ns + "group":
+                elements[-1].remove(element)
+
+
+def _open_control(controls, namespace):
+    element = controls[-1][0]
+    parent = controls[-2][1].id if len(controls) > 1 else None
+    entry = control_entry(element, parent, namespace)
+    controls[-1][1] = entry
+    if len(controls) > 1:
+        controls[-2][1].children.append(entry.id)
+    return entry
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# JSON CATALOGS
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def iter_json_controls(source, info=None):
+    """
+    Reads an OSCAL JSON catalog incrementally and yields a ControlEntry for
+    each control in document order, like iter_controls does for XML.
+    Only the ids of controls, params and response-point statement parts are
+    kept; the document is never built as nested dicts.
+
+    Uses ijson when it is installed: ijson builds one top-level control or
+    group at a time (in C with its yajl2_c backend), in separate passes for
+    the top-level controls and the groups. A source that can not be read
+    twice is first copied to a temporary file. Without ijson the document is
+    loaded with json.load (same results, but the whole document is held in
+    memory).
+
+    Parameters:
+    - source (str or obj): A file name or a binary file object opened for reading
+    - info (dict)[optional]: Receives "oscal_model" and "oscal_version"
+
+    Returns:
+    - generator of ControlEntry
+    """
+    info = info if info is not None else {}
+    if isinstance(source, str):
+        with open(source, mode='rb') as file:
+            yield from iter_json_controls(file, info)
+        return
+
+    try:
+        ijson = importlib.import_module("ijson")
+    except ImportError:
+        logger.debug("ijson is not installed; loading the JSON catalog in memory")
+        yield from _walk_json_catalog(json.load(source), info)
+        return
+
+    if not source.seekable():
+        with tempfile.TemporaryFile() as file:
+            shutil.copyfileobj(source, file, CHUNK_SIZE)
+            file.seek(0)
+            yield from iter_json_controls(file, info)
+        return
+
+    # Top-level controls first, then the groups, in the OSCAL model's order
+    start = source.tell()
+    model = ""
+    for prefix, event, value in ijson.parse(source):
+        if event == "map_key":
+            model = value
+            break
+    info["oscal_model"] = model
+    if not model:
+        return
+    source.seek(start)
+    info["oscal_version"] = str(next(ijson.items(source, model + ".metadata.oscal-version"), "")).strip()
+    source.seek(start)
+    for control in ijson.items(source, model + ".controls.item"):
+        yield from _walk_json_controls({"controls": [control]}, None)
+    source.seek(start)
+    for group in ijson.items(source, model + ".groups.item"):
+        yield from _walk_json_controls(group, None)
+
+
+def _walk_json_catalog(document, info):
+    # The same results as iter_json_controls, from a loaded document
+    model = next(iter(document), "")
+    info["oscal_model"] = model
+    info["oscal_version"] = str(document[model].get("metadata", {}).get("oscal-version", "")).strip()
+    yield from _walk_json_controls(document[model], None)
+
+
+def _walk_json_controls(node, parent):
+    # Controls before groups, as in the OSCAL model and the XML catalog
+    for control in node.get("controls", []):
+        entry = ControlEntry(control.get("id", "").strip(), parent.id if parent is not None else None)
+        entry.params = [param.get("id") for param in control.get("params", [])]
+        for part in control.get("parts", []):
+            if part.get("name") == "statement":
+                _json_response_points(part, entry.response_points)
+        if parent is not None:
+            parent.children.append(entry.id)
+        yield entry
+        yield from _walk_json_controls(control, entry)
+    for group in node.get("groups", []) if parent is None else []:
+        yield from _walk_json_controls(group, None)
+
+
+def _json_response_points(part, response_points):
+    if part.get("id") is not None:
+        for prop in part.get("props", []):
+            if prop.get("name") == "response-point" and prop.get("ns") == FEDRAMP_NAMESPACE:
+                response_points.append(part.get("id"))
+                break
+    for child in part.get("parts", []):
+        _json_response_points(child, response_points)
+
+
+def is_json_source(source):
+    """
+    Returns True if a catalog file name or seekable file object holds JSON
+    (its first non-blank character is "{").
+    """
+    if isinstance(source, str):
+        with open(source, mode='rb') as file:
+            return is_json_source(file)
+    position = source.tell()
+    start = source.read(256)
+    source.seek(position)
+    if isinstance(start, bytes):
+        start = start.decode("utf-8", errors="ignore")
+    return start.lstrip("\ufeff \t\r\n").startswith("{")
+
+
+def iter_catalog_controls(source, namespace=OSCAL_DEFAULT_NAMESPACE):
+    """
+    Yields the ControlEntry objects of an XML or JSON catalog file name or
+    file object in document order (see iter_controls and iter_json_controls).
+    """
+    if is_json_source(source):
+        if isinstance(source, io.TextIOBase):
+            source = io.BytesIO(source.read().encode("utf-8"))
+        return iter_json_controls(source)
+    return iter_controls(source, namespace)
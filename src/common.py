@@ -1,55 +1,477 @@
 from loguru import logger
-import requests
-import urllib
+from metrics import metrics
+import concurrent.futures
+import tempfile
+import threading
 import uuid
+import hashlib
+import json
+import os
+import time
+
+OSCAL_DEFAULT_NAMESPACE = "http://csrc.nist.gov/ns/oscal/1.0"
+FEDRAMP_NAMESPACE = "https://fedramp.gov/ns/oscal"
+
+CHUNK_SIZE = 1024 * 1024     # bytes read or written at a time when streaming files
 
 TAB = "   "
 def indent(level=0):
     return (TAB * level)
 
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# FETCH CACHE
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+class FetchCache:
+    """
+Fetch Cache Class
+
+A local, content-addressed cache for fetch_file.
+- Bodies are stored once under objects/ named by the SHA-256 of the content.
+- Each URL has an entry under urls/ (named by the SHA-256 of the URL) holding
+  the content hash, ETag, Last-Modified and the fetch/use times.
+
+Properties:
+- cache_dir: The cache directory
+- max_age: Seconds a cached copy is used without revalidation (None: always revalidate)
+- max_size: The maximum total size in bytes of cached bodies (None: unlimited)
+- max_unused: Seconds after which an entry that has not been used is evicted (None: never)
+- offline: When True, never contact the server; only cached copies are returned
+
+A FetchCache may be shared by the threads of a Fetcher.fetch_all call.
+    """
+    def __init__(self, cache_dir, max_age=None, max_size=None, max_unused=None, offline=False):
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.max_size = max_size
+        self.max_unused = max_unused
+        self.offline = offline
+        self.__lock = threading.RLock()
+        os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(cache_dir, "urls"), exist_ok=True)
+
+    def __entry_file(self, url):
+        return os.path.join(self.cache_dir, "urls", hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def __object_file(self, digest):
+        return os.path.join(self.cache_dir, "objects", digest)
+
+    def lookup(self, url):
+        """
+        Returns the cache entry (dict) for a URL or None if the URL is not
+        cached or its body is missing.
+        """
+        entry = None
+        try:
+            with open(self.__entry_file(url), mode='r', encoding='utf-8') as file:
+                entry = json.load(file)
+            if not os.path.isfile(self.__object_file(entry["sha256"])):
+                entry = None
+        except (OSError, ValueError, KeyError):
+            entry = None
+
+        return entry
+
+    def is_fresh(self, entry):
+        return self.max_age is not None and (time.time() - entry["fetched"]) < self.max_age
+
+    def body(self, entry):
+        """
+        Returns the cached body of an entry and records its use. Only the
+        stored entry's use time is changed, so the body of an entry that was
+        read before a revalidation keeps the revalidated fetch time.
+        """
+        return get_file(self.body_file(entry))
+
+    def body_file(self, entry):
+        """
+        Records the use of an entry like body() and returns the name of the
+        file holding its body, for reading it without loading it in memory.
+        """
+        with self.__lock:
+            self.__write_entry(dict(self.lookup(entry["url"]) or entry, used=time.time()))
+        return self.__object_file(entry["sha256"])
+
+    def validators(self, entry):
+        """
+        Returns the conditional request headers for a cached entry.
+        """
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def revalidated(self, entry):
+        """
+        Records a 304 Not Modified response for a cached entry.
+
+        Returns:
+        - The updated entry
+        """
+        with self.__lock:
+            entry = dict(entry, fetched=time.time())
+            self.__write_entry(entry)
+        return entry
+
+    def store(self, url, content, etag=None, last_modified=None):
+        with self.temp_file() as file:
+            file.write(content)
+        return self.store_file(url, file.name, etag, last_modified)
+
+    def temp_file(self):
+        """
+        Returns a new named binary file in the cache, for store_file.
+        """
+        return tempfile.NamedTemporaryFile(dir=os.path.join(self.cache_dir, "objects"), suffix=".tmp", delete=False)
+
+    def store_file(self, url, temp_file, etag=None, last_modified=None):
+        """
+        Moves a body written to a temp_file() into the cache as the content of a URL.
+
+        Returns:
+        - The name of the file holding the body in the cache
+        """
+        digest = hashlib.sha256()
+        size = 0
+        with open(temp_file, mode='rb') as file:
+            for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                size += len(chunk)
+        digest = digest.hexdigest()
+        object_file = self.__object_file(digest)
+        with self.__lock:
+            if os.path.isfile(object_file):
+                os.remove(temp_file)
+            else:
+                os.replace(temp_file, object_file)
+
+            now = time.time()
+            self.__write_entry({"url": url, "sha256": digest, "size": size, "etag": etag,
+                                "last_modified": last_modified, "fetched": now, "used": now})
+            self.__evict(keep=url)
+
+        return object_file
+
+    def __write_entry(self, entry):
+        entry_file = self.__entry_file(entry["url"])
+        temp_file = entry_file + "." + str(os.getpid()) + ".tmp"
+        with open(temp_file, mode='w', encoding='utf-8') as file:
+            json.dump(entry, file)
+        os.replace(temp_file, entry_file)
+
+    def evict(self):
+        """
+        Applies the eviction policy:
+        - entries not used for more than max_unused seconds are dropped
+        - least recently used entries are dropped until bodies fit in max_size
+        - bodies no longer referenced by any entry are deleted
+        """
+        with self.__lock:
+            self.__evict()
+
+    def __evict(self, keep=None):
+        # keep: a URL whose entry is never evicted (the one just stored, whose body is about to be read)
+        now = time.time()
+        entries = []
+        for name in os.listdir(os.path.join(self.cache_dir, "urls")):
+            if name.endswith(".json"):
+                try:
+                    with open(os.path.join(self.cache_dir, "urls", name), mode='r', encoding='utf-8') as file:
+                        entries.append(json.load(file))
+                except (OSError, ValueError):
+                    pass
+
+        entries.sort(key=lambda entry: entry["used"])
+        sizes = dict([(entry["sha256"], entry["size"]) for entry in entries])
+        total = sum(sizes.values())
+        kept = [entry for entry in entries if entry["url"] == keep]
+        entries = [entry for entry in entries if entry["url"] != keep]
+        while entries:
+            expired = self.max_unused is not None and (now - entries[0]["used"]) > self.max_unused
+            oversize = self.max_size is not None and total > self.max_size
+            if not (expired or oversize):
+                break
+            entry = entries.pop(0)
+            logger.debug("CACHE: Evicting {}", entry["url"])
+            os.remove(self.__entry_file(entry["url"]))
+            if entry["sha256"] not in [other["sha256"] for other in entries + kept]:
+                total -= sizes[entry["sha256"]]
+
+        referenced = set([entry["sha256"] for entry in entries + kept])
+        for name in os.listdir(os.path.join(self.cache_dir, "objects")):
+            if name not in referenced and not name.endswith(".tmp"):
+                os.remove(self.__object_file(name))
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# FETCHER
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+class Fetcher:
+    """
+Fetcher Class
+
+Downloads files over one pooled requests session, so connections to a host
+are reused across fetches, with timeouts and retries. fetch_all() downloads
+many URLs concurrently in a thread pool limited to max_workers.
+
+A failed attempt (connection error, timeout, HTTP 429 or 5xx) is retried
+after backoff * 2 ** (attempt - 1) seconds, at most max_backoff (or the
+server's Retry-After, when it gives one in seconds). Other HTTP errors are
+not retried.
+
+Properties:
+- timeout: Seconds to wait to connect and for each read (a number or a (connect, read) tuple)
+- retries: The number of retries after the first attempt
+- backoff: The delay in seconds before the first retry
+- max_backoff: The maximum delay in seconds between attempts
+- max_workers: The maximum number of concurrent fetches in fetch_all (and pooled connections per host)
+- user_agent: The User-Agent header sent
+    """
+    RETRY_STATUS = [429, 500, 502, 503, 504]
+
+    def __init__(self, timeout=(10, 60), retries=3, backoff=0.5, max_backoff=30, max_workers=8,
+                 user_agent='Mozilla/5.0 (X11; Linux x86_64) '):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_workers = max_workers
+        self.user_agent = user_agent
+        self.__session = None
+        self.__lock = threading.Lock()
+
+    @property
+    def session(self):
+        with self.__lock:
+            if self.__session is None:
+                import requests # only needed here; keeps module import light
+                self.__session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+                self.__session.mount("http://", adapter)
+                self.__session.mount("https://", adapter)
+                self.__session.headers["User-Agent"] = self.user_agent
+        return self.__session
+
+    def close(self):
+        with self.__lock:
+            if self.__session is not None:
+                self.__session.close()
+                self.__session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def fetch(self, url, cache=None):
+        """
+        Downloads a file.
+        If a FetchCache is provided, a cached copy is returned when fresh (or offline),
+        otherwise the server is asked with a conditional request and only sends the
+        content if it changed. A stale cached copy is used if the server can't be reached.
+
+        Returns:
+        - The file contents (empty string on failure)
+        """
+        with metrics.phase("fetch"):
+            (source, retries) = self.__retrieve(url, cache)
+            ret_value = normalize_content(_read_source(source))
+            metrics.count("bytes_fetched", len(ret_value))
+            metrics.count("fetch_retries", retries)
+
+        return ret_value
+
+    def fetch_stream(self, url, cache=None):
+        """
+        Downloads a file like fetch(), without ever holding its content in
+        memory: the body is written to the cache (or, without a cache, to a
+        temporary file) as it arrives.
+
+        Returns:
+        - A binary file object at the start of the content, which the caller closes,
+          or None on failure
+        """
+        with metrics.phase("fetch"):
+            (source, retries) = self.__retrieve(url, cache)
+            metrics.count("fetch_retries", retries)
+
+        return open(source, mode='rb') if isinstance(source, str) else source
+
+    def fetch_all(self, urls, cache=None):
+        """
+        Downloads many files concurrently, at most max_workers at a time.
+        Each distinct URL is fetched once.
+
+        Returns:
+        - dict of file contents keyed by URL (empty string for those that failed)
+        """
+        ret_value = {}
+        urls = list(dict.fromkeys(urls))
+        with metrics.phase("fetch"):
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(urls)))) as pool:
+                # the worker threads only download; the bodies are read here
+                for (url, (source, retries)) in zip(urls, pool.map(lambda url: self.__retrieve(url, cache), urls)):
+                    ret_value[url] = normalize_content(_read_source(source))
+                    metrics.count("bytes_fetched", len(ret_value[url]))
+                    metrics.count("fetch_retries", retries)
+
+        return ret_value
+
+    def __retrieve(self, url, cache):
+        # Returns (source, number of retries). The source is the content as a cache
+        # object file name or an unnamed temporary file at its start (None on failure).
+        # Runs in fetch_all's worker threads, so it reads no bodies and records no metrics.
+        source = None
+        header = {}
+        entry = None
+        retries = 0
+
+        if cache is not None:
+            entry = cache.lookup(url)
+            if entry is not None and (cache.offline or cache.is_fresh(entry)):
+                logger.debug("Fetching from cache: {}", url)
+                return (cache.body_file(entry), retries)
+            elif cache.offline:
+                logger.error("Offline and not cached: " + url)
+                return (source, retries)
+            elif entry is not None:
+                header.update(cache.validators(entry))
+
+        logger.debug("Fetching: {}", url)
+        (response, body, retries) = self.__get(url, header, cache)
+        if response is None:
+            pass
+        elif response.status_code == 304 and entry is not None:
+            logger.debug("Not modified, using cache: {}", url)
+            entry = cache.revalidated(entry)
+            source = cache.body_file(entry)
+        elif response.status_code >= 400 or body is None:
+            logger.error("The server returned an HTTP error. HTTP " + str(response.status_code) + " " + str(response.reason) + " for " + url)
+        elif cache is not None:
+            source = cache.store_file(url, body, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        else:
+            source = body
+
+        if source is None and entry is not None:
+            logger.warning("Using stale cached copy of " + url)
+            source = cache.body_file(entry)
+
+        return (source, retries)
+
+    def __get(self, url, header, cache):
+        # Returns (the final response or None if every attempt failed to get one,
+        # the downloaded body (see __download) or None, number of retries)
+        import requests
+        ret_value = None
+        attempt = 0
+        for attempt in range(self.retries + 1):
+            delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+            try:
+                with self.session.get(url, headers=header, timeout=self.timeout, stream=True) as response:
+                    ret_value = response
+                    if response.status_code < 300:
+                        return (ret_value, self.__download(response, cache), attempt)
+                    # read the (short) error body so the connection goes back to the pool
+                    response.content
+                    if response.status_code not in self.RETRY_STATUS:
+                        return (ret_value, None, attempt)
+                    retry_after = response.headers.get("Retry-After", "")
+                    if retry_after.isdigit():
+                        delay = min(self.max_backoff, int(retry_after))
+                    problem = "HTTP " + str(response.status_code)
+            except requests.exceptions.Timeout:
+                problem = "TIMEOUT: The server took too long to respond."
+            except requests.exceptions.TooManyRedirects:
+                logger.error("Bad URL or too many redirects: " + url)
+                break
+            except requests.exceptions.RequestException as error:
+                problem = "(" + type(error).__name__ + ") " + str(error)
+            except (Exception, BaseException) as error:
+                logger.error("Problem downloading " + url + " (" + type(error).__name__ + ") " + str(error))
+                break
+
+            if attempt == self.retries:
+                logger.error("Unable to fetch " + url + " after " + str(attempt + 1) + " attempts. " + problem)
+            else:
+                logger.warning("Fetching " + url + " failed (" + problem + "). Retrying in " + str(delay) + "s")
+                time.sleep(delay)
+
+        return (ret_value, None, attempt)
+
+    def __download(self, response, cache):
+        # Writes the response body in chunks to a temporary file in the cache
+        # (returns its name) or, without a cache, to an unnamed one (returns it at its start)
+        file = cache.temp_file() if cache is not None else tempfile.TemporaryFile()
+        try:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                file.write(chunk)
+        except BaseException:
+            file.close()
+            if cache is not None:
+                os.remove(file.name)
+            raise
+        if cache is not None:
+            file.close()
+            return file.name
+        file.seek(0)
+        return file
+
+
+def _read_source(source):
+    # Returns the content of a source from Fetcher.__retrieve as bytes
+    if source is None:
+        return b""
+    elif isinstance(source, str):
+        return get_file(source)
+    with source:
+        return source.read()
+
+
+# The Fetcher used by fetch_file when none is given
+default_fetcher = Fetcher()
+
 # Downloads a file from a specified URL 
-# Returns status and the file contents
-def fetch_file(url):
-    status = False
-    ret_value = ""
-    header = {'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) '}
+# Returns the file contents (empty string on failure)
+# See Fetcher.fetch for the use of the cache.
+def fetch_file(url, cache=None, fetcher=None):
+    return (fetcher or default_fetcher).fetch(url, cache)
 
-    logger.debug("Fetching: " + url)
-    try:
-        req = urllib.request.Request(url=url, headers=header)
-        with urllib.request.urlopen(req) as response:
-            ret_value = response.read()
-        status = True
-    except requests.exceptions.HTTPError as err:
-        logger.error("The server returned an HTTP error.", str(err))
-    except requests.exceptions.Timeout:
-        # Maybe set up for a retry, or continue in a retry loop
-        logger.error("TIMEOUT: The server took too long to respond.")
-    except requests.exceptions.TooManyRedirects:
-        # Tell the user their URL was bad and try a different one
-        logger.error("Bad URL or too many redirects.")
-    except requests.exceptions.RequestException as err:
-        # catastrophic error.
-        logger.error("Unable to fetch file.", str(err))
-    except (Exception, BaseException) as error:
-        logger.error("Problem downloading " + url, "(" + type(error).__name__ + ") " + str(error))
 
-    if status:
-        status = len(ret_value) > 0
-        logger.debug("CONTENT TYPE: " + str(type(ret_value)))
-        ret_value = normalize_content(ret_value)
-        
-    return ret_value
+def fetch_stream(url, cache=None, fetcher=None):
+    """
+    Downloads a file without holding it in memory (see Fetcher.fetch_stream).
+
+    Returns:
+    - A binary file object, which the caller closes, or None on failure
+    """
+    return (fetcher or default_fetcher).fetch_stream(url, cache)
+
+
+def fetch_files(urls, cache=None, fetcher=None):
+    """
+    Downloads many files concurrently with fetcher (default: default_fetcher).
+
+    Returns:
+    - dict of file contents keyed by URL (empty string for those that failed)
+    """
+    return (fetcher or default_fetcher).fetch_all(urls, cache)
+
+def is_url(location):
+    return location.startswith("http://") or location.startswith("https://")
 
 def get_file(file_name):
     ret_value = ""
 
-    try:
-        file = open(file_name, "rb")
-        ret_value = file.read()
-        file.close()
-    except OSError:
-        logger.debug("Could not open/read " + file_name)
+    with metrics.phase("read"):
+        try:
+            file = open(file_name, "rb")
+            ret_value = file.read()
+            file.close()
+            metrics.count("bytes_read", len(ret_value))
+        except OSError:
+            logger.debug("Could not open/read {}", file_name)
 
     return ret_value
 
@@ -64,13 +486,13 @@ def normalize_content(content):
         ret_value = content.decode("utf-8")
         # logger.debug("Decode")
     else:
-        logger.debug("Unhandled content encoding: " + type(content))
+        logger.debug("Unhandled content encoding: {}", type(content))
 
     return ret_value
 
 
 def putfile(file_name, content):
-    logger.debug("LFS Put File " + file_name)
+    logger.debug("LFS Put File {}", file_name)
     status = False
     try:
         with open(file_name, mode='w') as file:
@@ -83,6 +505,22 @@ def putfile(file_name, content):
     return status
 
 
+class ByteCounter:
+    """
+    Wraps a binary stream and counts the bytes written through it.
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self.bytes_written = 0
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        return self.stream.write(data)
+
+    def writable(self):
+        return True
+
+
 def uuid_format(uuid_suffix=None):
     ret_value = ""
     if uuid_suffix is None:
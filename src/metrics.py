@@ -0,0 +1,172 @@
+import json
+import sys
+import threading
+import time
+import tracemalloc
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# RUN METRICS
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+class RunMetrics:
+    """
+Run Metrics Class
+
+Records per-phase wall time, peak memory and counters for a run.
+Recording is off until start() is called; while off, phase() and count()
+return immediately so the instrumentation can stay in the hot path.
+
+Phases may nest (e.g. "build" inside "traverse") and may be entered many
+times; each entry adds to the phase's call count and time. Counters are
+added to the innermost open phase and to the run totals.
+
+Only the thread that called start() is recorded; phases and counters from
+other threads (e.g. fetch worker threads) are ignored, so they can not
+interleave with the main thread's open phases.
+
+Properties:
+- enabled: True between start() and stop()
+- trace_memory: True if peak memory is traced with tracemalloc (slower)
+- hook: Optional callable hook(phase_name, phase_record) called each time a phase ends
+- phases: A dict of phase records keyed by phase name, in first-entered order
+- counters: The run total for each counter
+    """
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.hook = None
+        self.phases = {}
+        self.counters = {}
+        self.__open = []
+        self.__thread = None
+        self.__started = 0.0
+        self.__seconds = 0.0
+        self.__own_tracing = False
+
+    def start(self, trace_memory=False, hook=None):
+        """
+        Clears any previous results and starts recording.
+
+        Parameters:
+        - trace_memory (bool)[optional]: Trace Python memory allocations to report
+          per-phase peak memory. Adds noticeable overhead.
+        - hook (callable)[optional]: Called as hook(phase_name, phase_record) when a phase ends
+        """
+        self.phases = {}
+        self.counters = {}
+        self.__open = []
+        self.trace_memory = trace_memory
+        self.hook = hook
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.__own_tracing = True
+        self.__started = time.perf_counter()
+        self.__seconds = 0.0
+        self.__thread = threading.get_ident()
+        self.enabled = True
+
+    def stop(self):
+        if self.enabled:
+            self.__seconds = time.perf_counter() - self.__started
+            self.enabled = False
+            if self.__own_tracing:
+                tracemalloc.stop()
+                self.__own_tracing = False
+
+    def phase(self, name):
+        """
+        Returns a context manager that records one entry into a phase.
+        """
+        return _Phase(self, name)
+
+    def count(self, name, amount=1):
+        if self._recording():
+            self.counters[name] = self.counters.get(name, 0) + amount
+            if self.__open:
+                counters = self.phases[self.__open[-1][0]]["counters"]
+                counters[name] = counters.get(name, 0) + amount
+
+    def _recording(self):
+        return self.enabled and threading.get_ident() == self.__thread
+
+    def _enter(self, name):
+        record = self.phases.get(name)
+        if record is None:
+            record = {"calls": 0, "seconds": 0.0, "peak_memory_bytes": None, "counters": {}}
+            self.phases[name] = record
+        record["calls"] += 1
+        frame = [name, time.perf_counter(), 0]
+        if self.trace_memory:
+            if self.__open:
+                # remember the enclosing phase's peak so far before resetting the peak
+                self.__open[-1][2] = max(self.__open[-1][2], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self.__open.append(frame)
+
+    def _exit(self):
+        name, started, peak = self.__open.pop()
+        record = self.phases[name]
+        record["seconds"] += time.perf_counter() - started
+        if self.trace_memory:
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            record["peak_memory_bytes"] = max(record["peak_memory_bytes"] or 0, peak)
+            if self.__open:
+                self.__open[-1][2] = max(self.__open[-1][2], peak)
+        if self.hook is not None:
+            self.hook(name, record)
+
+    def report(self):
+        """
+        Returns the results as a JSON-serializable dict.
+        """
+        seconds = time.perf_counter() - self.__started if self.enabled else self.__seconds
+        phases = {}
+        for name, record in self.phases.items():
+            phases[name] = dict(record, seconds=round(record["seconds"], 6), counters=dict(record["counters"]))
+        return {"seconds": round(seconds, 6),
+                "max_rss_bytes": max_rss_bytes(),
+                "trace_memory": self.trace_memory,
+                "phases": phases,
+                "counters": dict(self.counters)}
+
+    def write_report(self, file_name):
+        with open(file_name, mode='w', encoding='utf-8') as file:
+            json.dump(self.report(), file, indent=2)
+
+
+class _Phase:
+    __slots__ = ("metrics", "name", "active")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.active = False
+
+    def __enter__(self):
+        if self.metrics._recording():
+            self.active = True
+            self.metrics._enter(self.name)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.active:
+            self.metrics._exit()
+        return False
+
+
+def max_rss_bytes():
+    """
+    Returns the peak resident set size of this process in bytes (None where unavailable).
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+# Shared by the whole process
+metrics = RunMetrics()
@@ -0,0 +1,114 @@
+from loguru import logger
+from ssp_index import local_name
+import re
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# NODE INDEX
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+class NodeIndex:
+    """
+Node Index Class
+
+Maps the id, uuid and control-id attribute values and the element paths of
+an OSCAL document's elements to the elements, built with one walk of the
+tree and kept current as elements are added. Only for backends with an
+element API (stdlib and lxml).
+
+An element path is the local names from (not including) the root element,
+separated by "/", e.g. "control-implementation/implemented-requirement".
+The root element has no element path but its id, uuid and control-id are
+indexed, as //name[@uuid='value'] selects it too.
+
+Properties:
+- ids: A dict of elements keyed by id
+- uuids: A dict of elements keyed by uuid
+- control_ids: A dict of elements keyed by control-id (the first in document order)
+- paths: A dict of lists of elements, in document order, keyed by element path
+    """
+    def __init__(self, root=None):
+        self.ids = {}
+        self.uuids = {}
+        self.control_ids = {}
+        self.paths = {}
+
+        if root is not None:
+            self.__add_values(root)
+            for child in root:
+                self.add(child, "")
+            logger.debug("NODE INDEX: {} paths, {} ids, {} uuids", len(self.paths), len(self.ids), len(self.uuids))
+
+    def add(self, element, parent_path):
+        """
+        Indexes an element and its descendants.
+
+        Parameters:
+        - element (obj): The element
+        - parent_path (str): The element path of its parent ("" for the root)
+        """
+        name = local_name(element)
+        if not name:
+            return
+        path = parent_path + "/" + name if parent_path else name
+        self.paths.setdefault(path, []).append(element)
+        self.__add_values(element)
+        for child in element:
+            self.add(child, path)
+
+    def __add_values(self, element):
+        for (attribute, values) in [("id", self.ids), ("uuid", self.uuids), ("control-id", self.control_ids)]:
+            value = element.get(attribute)
+            if value is not None:
+                values.setdefault(value, element)
+
+    def find(self, path):
+        """
+        Returns the first element at an element path or None.
+        """
+        elements = self.paths.get(normalize_path(path))
+        return elements[0] if elements else None
+
+    def find_all(self, path):
+        return list(self.paths.get(normalize_path(path), []))
+
+    def is_last(self, element, path):
+        """
+        Returns True if the element is the last one (in document order) at an
+        element path, so its new last children can be added with add().
+        """
+        elements = self.paths.get(normalize_path(path))
+        return bool(elements) and elements[-1] is element
+
+    def select(self, xExpr):
+        """
+        Answers an XPath expression from the index when it is an element path
+        or has the form //name[@attr='value'] (or //*[...]) with attr one of
+        id, uuid or control-id.
+
+        Returns:
+        - list of elements, or None if the expression can not be answered from the index
+        """
+        ret_value = None
+        match = _ATTRIBUTE_XPATH.match(xExpr)
+        if match is not None:
+            values = {"id": self.ids, "uuid": self.uuids, "control-id": self.control_ids}[match.group(2)]
+            element = values.get(match.group(4))
+            if element is None:
+                ret_value = []
+            elif match.group(1) in ["*", local_name(element)]:
+                ret_value = [element]
+            # otherwise the value is on another kind of element; let XPath decide
+        elif is_element_path(xExpr):
+            ret_value = self.find_all(xExpr)
+
+        return ret_value
+
+
+_ATTRIBUTE_XPATH = re.compile(r"""^\s*//(\*|[A-Za-z_][\w.-]*)\[\s*@(id|uuid|control-id)\s*=\s*(["'])([^"']*)\3\s*\]\s*$""")
+_ELEMENT_PATH = re.compile(r"^(\./)?[A-Za-z_][\w.-]*(/[A-Za-z_][\w.-]*)*$")
+
+def is_element_path(path):
+    return _ELEMENT_PATH.match(path) is not None
+
+
+def normalize_path(path):
+    return path[2:] if path.startswith("./") else path
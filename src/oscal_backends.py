@@ -0,0 +1,350 @@
+from loguru import logger
+from xml.etree import ElementTree
+from collections import OrderedDict
+import decimal
+import importlib
+import json
+import math
+import re
+from common import *
+
+def lazy_import(module_name):
+    """
+    Imports a module the first time a backend needs it.
+    Heavy libraries (elementpath, lxml, saxonche) are only loaded when used.
+    """
+    return importlib.import_module(module_name)
+
+
+def xpath_number(value):
+    """
+    Returns an XPath number the same way on every backend: integral numbers
+    as int (so count() reads "60", not "60.0") and others as float, whether
+    the backend gives XPath 1.0 doubles or XPath 2.0+ decimals and doubles.
+    Any other value is returned unchanged.
+    """
+    if isinstance(value, (float, decimal.Decimal)):
+        if value.is_finite() if isinstance(value, decimal.Decimal) else math.isfinite(value):
+            return int(value) if value == int(value) else float(value)
+        return float(value)
+    return value
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# XPATH CACHE
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+class XPathCache:
+    """
+XPath Cache Class
+
+Holds compiled XPath expressions so an expression is only tokenized
+and parsed the first time it is used with a given backend and namespace map.
+The least recently used expression is evicted once maxsize is reached.
+
+Properties:
+- maxsize: The maximum number of compiled expressions to hold
+- hits: The number of lookups satisfied from the cache
+- misses: The number of lookups that required compiling the expression
+    """
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__selectors = OrderedDict()
+
+    def selector(self, xExpr, nsmap=None, backend=None):
+        """
+        Returns the compiled expression for an xpath expression, namespace map
+        and backend, compiling and caching it if it is not already present.
+        The compiled expression is a callable taking the context node and
+        returning a list of results.
+        """
+        backend = backend or STDLIB_BACKEND
+        key = (backend.name, xExpr, tuple(sorted((nsmap or {}).items())))
+        selector = self.__selectors.get(key)
+        if selector is not None:
+            self.hits += 1
+            self.__selectors.move_to_end(key)
+        else:
+            self.misses += 1
+            selector = backend.compile(xExpr, nsmap)
+            self.__selectors[key] = selector
+            if len(self.__selectors) > self.maxsize:
+                self.__selectors.popitem(last=False)
+
+        return selector
+
+    def clear(self):
+        self.__selectors.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.__selectors), "maxsize": self.maxsize}
+
+# Shared by all oscal objects in the process
+xpath_cache = XPathCache()
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# BACKENDS
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+class StdlibBackend:
+    """
+Standard library backend: xml.etree.ElementTree trees queried with elementpath.
+    """
+    name = "stdlib"
+    mutable = True
+
+    def parse(self, content):
+        """
+        Returns the root element, or raises ValueError if the content is not well-formed.
+        """
+        try:
+            return ElementTree.fromstring(content.encode('utf_8'))
+        except ElementTree.ParseError as e:
+            raise ValueError(f"{e.msg} (Line: {e.position[0]}, Column: {e.position[1]})")
+
+    def compile(self, xExpr, nsmap):
+        selector = lazy_import("elementpath").Selector(xExpr, namespaces=nsmap)
+
+        def select(node):
+            ret_value = selector.select(node, namespaces=nsmap)
+            return ret_value if isinstance(ret_value, list) else [xpath_number(ret_value)]
+        return select
+
+    def document_info(self, tree, nsmap):
+        """
+        Returns the root element's local name and the metadata/oscal-version value.
+        """
+        oscal_version = tree.findtext("./metadata/oscal-version", "", namespaces=nsmap) or ""
+        return tree.tag.rpartition("}")[2], oscal_version.strip()
+
+    def indent(self, tree):
+        ElementTree.indent(tree)
+
+    def element(self, tag):
+        return ElementTree.Element(tag)
+
+    def to_string(self, element, space="  "):
+        """
+        Returns an element as indented text, without an XML declaration.
+        """
+        ElementTree.indent(element, space=space)
+        return ElementTree.tostring(element, encoding="unicode")
+
+    def write(self, tree, stream, nsmap):
+        # ElementTree's default_namespace option rejects un-prefixed attributes, so
+        # the OSCAL namespace is registered with an empty prefix instead.
+        ElementTree.register_namespace("", nsmap.get(""))
+        ElementTree.ElementTree(tree).write(stream, encoding="utf-8", xml_declaration=True)
+
+
+class LxmlBackend:
+    """
+lxml backend: lxml trees, compiled etree.XPath expressions and native serialization.
+
+lxml implements XPath 1.0, which has no default element namespace, so
+un-prefixed element names in an expression are bound to the default namespace
+before compiling. Expressions that are not XPath 1.0 (for example /*/name())
+fall back to elementpath, which also works on lxml trees.
+    """
+    name = "lxml"
+    mutable = True
+    DEFAULT_PREFIX = "oscal_default_ns"
+
+    def __init__(self):
+        self.etree = lazy_import("lxml.etree")
+        self.__parser = self.etree.XMLParser(resolve_entities=False, huge_tree=True)
+
+    def parse(self, content):
+        try:
+            return self.etree.fromstring(content.encode('utf_8'), self.__parser)
+        except self.etree.XMLSyntaxError as e:
+            raise ValueError(f"{e.msg} (Line: {e.lineno}, Column: {e.offset})")
+
+    def compile(self, xExpr, nsmap):
+        namespaces = dict([(prefix, uri) for (prefix, uri) in (nsmap or {}).items() if prefix])
+        expression = xExpr
+        if (nsmap or {}).get(""):
+            namespaces[self.DEFAULT_PREFIX] = nsmap[""]
+            expression = qualify_xpath(xExpr, self.DEFAULT_PREFIX)
+        try:
+            compiled = self.etree.XPath(expression, namespaces=namespaces)
+        except self.etree.XPathError:
+            logger.debug("Not XPath 1.0, using elementpath: {}", xExpr)
+            return STDLIB_BACKEND.compile(xExpr, nsmap)
+
+        def select(node):
+            ret_value = compiled(node)
+            return ret_value if isinstance(ret_value, list) else [xpath_number(ret_value)]
+        return select
+
+    def document_info(self, tree, nsmap):
+        return STDLIB_BACKEND.document_info(tree, nsmap)
+
+    def indent(self, tree):
+        self.etree.indent(tree)
+
+    def element(self, tag):
+        return self.etree.Element(tag)
+
+    def to_string(self, element, space="  "):
+        self.etree.indent(element, space=space)
+        return self.etree.tostring(element, encoding="unicode")
+
+    def write(self, tree, stream, nsmap):
+        self.etree.ElementTree(tree).write(stream, encoding="utf-8", xml_declaration=True)
+
+
+class SaxonBackend:
+    """
+Saxon backend: XDM trees queried with XPath 3.1 by SaxonC (saxonche).
+
+One PySaxonProcessor is shared by the whole process, and one XPath processor
+is kept per namespace map with Saxon's compiled-expression cache enabled,
+so an expression is compiled once however many contexts it is evaluated on.
+XDM trees are immutable: this backend is for querying (e.g. catalogs);
+documents that need to be modified use stdlib or lxml.
+
+Results are returned as lists: nodes as PyXdmNode objects (usable as query
+contexts), attribute nodes as their string values and atomic values as
+Python str, int, float or bool. As with the other backends, parse() returns
+the root element, so relative paths such as ./metadata/title start there.
+    """
+    name = "saxon"
+    mutable = False
+    LANGUAGE_VERSION = "3.1"
+
+    def __init__(self):
+        self.saxonche = lazy_import("saxonche")
+        self.processor = self.saxonche.PySaxonProcessor(license=False)
+        self.__xpath_processors = {}
+
+    def xpath_processor(self, nsmap):
+        key = tuple(sorted((nsmap or {}).items()))
+        xp = self.__xpath_processors.get(key)
+        if xp is None:
+            xp = self.processor.new_xpath_processor()
+            xp.set_language_version(self.LANGUAGE_VERSION)
+            for (prefix, uri) in (nsmap or {}).items():
+                xp.declare_namespace(prefix, uri)
+            xp.set_caching(True)
+            self.__xpath_processors[key] = xp
+        return xp
+
+    def parse(self, content):
+        try:
+            document = self.processor.parse_xml(xml_text=content)
+        except self.saxonche.PySaxonApiError as e:
+            raise ValueError(str(e))
+        for child in document.children:
+            if child.node_kind_str == "element":
+                return child
+        raise ValueError("No root element")
+
+    def compile(self, xExpr, nsmap):
+        xp = self.xpath_processor(nsmap)
+
+        def select(node):
+            xp.set_context(xdm_item=node)
+            return self.__to_list(xp.evaluate(xExpr))
+        return select
+
+    def __to_list(self, value):
+        ret_value = []
+        if value is not None:
+            for index in range(value.size):
+                item = value.item_at(index)
+                if item.is_node:
+                    ret_value.append(item.string_value if item.node_kind_str == "attribute" else item)
+                elif item.is_atomic:
+                    ret_value.append(self.__atomic(item))
+                else:
+                    ret_value.append(item)
+        return ret_value
+
+    def __atomic(self, item):
+        type_name = item.primitive_type_name.rpartition("}")[2]
+        if type_name == "integer":
+            return item.integer_value
+        elif type_name in ["double", "float", "decimal"]:
+            return xpath_number(item.double_value)
+        elif type_name == "boolean":
+            return item.boolean_value
+        return item.string_value
+
+    def document_info(self, tree, nsmap):
+        xp = self.xpath_processor(nsmap)
+        xp.set_context(xdm_item=tree)
+        root_name = xp.evaluate_single("local-name(/*)")
+        oscal_version = xp.evaluate_single("string(/*/metadata/oscal-version)")
+        return (root_name.string_value if root_name is not None else "",
+                oscal_version.string_value.strip() if oscal_version is not None else "")
+
+    def control_rows(self, tree, nsmap):
+        """
+        Returns (id, param ids, response-point ids, parent id) for every control
+        in document order, computed by a single XPath 3.1 evaluation.
+        """
+        xp = self.xpath_processor(nsmap)
+        xp.set_context(xdm_item=tree)
+        result = xp.evaluate_single("serialize(array { for $c in //control return array { "
+                                    "normalize-space($c/@id), "
+                                    "array { $c/param/@id ! string() }, "
+                                    "array { $c/part[@name='statement']//prop[@name='response-point' and @ns='" + FEDRAMP_NAMESPACE + "']/../@id ! string() }, "
+                                    "normalize-space($c/parent::control/@id) } }, map { 'method': 'json' })")
+        return [(control_id, params, response_points, parent or None)
+                for (control_id, params, response_points, parent) in json.loads(result.string_value)]
+
+    def indent(self, tree):
+        pass
+
+    def write(self, tree, stream, nsmap):
+        # the document node, keeping any comments and processing instructions around the root
+        xp = self.xpath_processor(nsmap)
+        xp.set_context(xdm_item=tree)
+        stream.write(xp.evaluate_single("/").to_string("utf-8").encode("utf-8"))
+
+
+STDLIB_BACKEND = StdlibBackend()
+BACKENDS = {"stdlib": StdlibBackend, "lxml": LxmlBackend, "saxon": SaxonBackend}
+_backends = {"stdlib": STDLIB_BACKEND}
+
+def get_backend(name="stdlib"):
+    """
+    Returns the shared backend instance for a backend name ("stdlib", "lxml" or "saxon").
+    """
+    if name not in BACKENDS:
+        raise ValueError("Unknown backend: " + str(name) + " (expected one of " + ", ".join(BACKENDS) + ")")
+    if name not in _backends:
+        _backends[name] = BACKENDS[name]()
+    return _backends[name]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+_XPATH_TOKENS = re.compile(r"""("[^"]*"|'[^']*')|(\$?[A-Za-z_][\w.-]*(?::[A-Za-z_][\w.-]*)?)|(::)|(\s+)|(.)""")
+_XPATH_OPERATOR_NAMES = ["and", "or", "div", "mod"]
+
+def qualify_xpath(xExpr, prefix):
+    """
+    Adds a namespace prefix to the un-prefixed element name tests in an
+    XPath 1.0 expression. Attribute names, axis names, function names,
+    node type tests, variables, operators and literals are left alone.
+    """
+    tokens = [match.group(0) for match in _XPATH_TOKENS.finditer(xExpr)]
+    significant = [index for (index, token) in enumerate(tokens) if not token.isspace()]
+    out = list(tokens)
+    for position, index in enumerate(significant):
+        token = tokens[index]
+        if not (token[0].isalpha() or token[0] == "_") or ":" in token:
+            continue
+        previous = tokens[significant[position - 1]] if position > 0 else None
+        following = tokens[significant[position + 1]] if position + 1 < len(significant) else None
+        if following in ["(", "::"]:
+            continue # function, node type test or axis name
+        if previous == "@" or (previous == "::" and position > 1 and tokens[significant[position - 2]] == "attribute"):
+            continue # attribute name
+        if token in _XPATH_OPERATOR_NAMES and previous is not None and previous not in ["@", "::", "(", "[", ",", "/", "|", "+", "-", "=", "<", ">"] + _XPATH_OPERATOR_NAMES:
+            continue # operator
+        out[index] = prefix + ":" + token
+
+    return "".join(out)
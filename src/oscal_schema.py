@@ -0,0 +1,304 @@
+from loguru import logger
+from common import *
+from metrics import metrics
+from oscal_backends import lazy_import
+from xml.etree import ElementTree
+import concurrent.futures
+import hashlib
+import io
+import json
+import os
+import pickle
+import time
+
+OSCAL_MODELS = ["catalog", "profile", "component-definition", "system-security-plan", "assessment-plan", "assessment-results", "plan-of-action-and-milestones"]
+
+# The short model names used in the NIST OSCAL schema file names (oscal_<name>_schema.xsd)
+SCHEMA_NAMES = {"catalog": "catalog", "profile": "profile", "component-definition": "component",
+                "system-security-plan": "ssp", "assessment-plan": "assessment-plan",
+                "assessment-results": "assessment-results", "plan-of-action-and-milestones": "poam"}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# SCHEMA CACHE
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+class SchemaCache:
+    """
+Schema Cache Class
+
+Loads the NIST OSCAL XML schema for a model and OSCAL version from a local
+directory and keeps the compiled schema, so each schema is compiled at most
+once per process. Schemas are looked up as
+<schema_dir>/<oscal-version>/oscal_<name>_schema.xsd (or v<oscal-version>),
+e.g. schemas/1.1.2/oscal_ssp_schema.xsd, as published with each OSCAL release.
+
+With the xmlschema engine, compiled schemas are also saved under cache_dir,
+named by the SHA-256 of the XSD, so later runs and worker processes load
+them instead of compiling the XSD again. lxml (libxml2) schemas can not be
+saved and are only cached in-process.
+
+Properties:
+- schema_dir: The directory holding the OSCAL XSD files
+- cache_dir: The directory for compiled schemas (None: in-process only)
+- engine: "xmlschema" or "lxml"
+- max_errors: The maximum number of errors reported for one document
+- schemas: A dict of compiled schemas keyed by (model, oscal version)
+    """
+    CACHE_VERSION = 1
+
+    def __init__(self, schema_dir, cache_dir=None, engine=None, max_errors=20):
+        self.schema_dir = schema_dir
+        self.cache_dir = cache_dir
+        self.engine = engine or default_engine()
+        self.max_errors = max_errors
+        self.schemas = {}
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def schema_file(self, model, oscal_version):
+        """
+        Returns the XSD file name for a model and OSCAL version or None if
+        there is none in schema_dir.
+        """
+        ret_value = None
+        if model in SCHEMA_NAMES:
+            file_name = "oscal_" + SCHEMA_NAMES[model] + "_schema.xsd"
+            for version_dir in [oscal_version, "v" + oscal_version]:
+                candidate = os.path.join(self.schema_dir, version_dir, file_name)
+                if os.path.isfile(candidate):
+                    ret_value = candidate
+                    break
+
+        return ret_value
+
+    def get(self, model, oscal_version):
+        """
+        Returns the compiled schema for a model and OSCAL version, or None if
+        there is no schema for them or it could not be compiled.
+        """
+        key = (model, oscal_version)
+        if key not in self.schemas:
+            self.schemas[key] = None
+            schema_file = self.schema_file(model, oscal_version)
+            if schema_file is None:
+                logger.warning("SCHEMA: No " + model + " schema for OSCAL " + oscal_version + " in " + self.schema_dir)
+            else:
+                self.schemas[key] = self.__load(schema_file)
+
+        return self.schemas[key]
+
+    def __cache_file(self, schema_file):
+        with open(schema_file, mode='rb') as file:
+            digest = hashlib.sha256(file.read()).hexdigest()
+        engine_version = lazy_import("xmlschema").__version__
+        return os.path.join(self.cache_dir, digest + ".xmlschema-" + engine_version + ".v" + str(self.CACHE_VERSION) + ".pickle")
+
+    def __load(self, schema_file):
+        ret_value = None
+        cache_file = None
+        if self.cache_dir is not None and self.engine == "xmlschema":
+            cache_file = self.__cache_file(schema_file)
+            try:
+                with metrics.phase("schema_load"):
+                    with open(cache_file, mode='rb') as file:
+                        ret_value = pickle.load(file)
+                logger.debug("SCHEMA: Loaded compiled {}", cache_file)
+                return ret_value
+            except FileNotFoundError:
+                pass
+            except (Exception, BaseException) as error:
+                logger.warning("SCHEMA: Ignoring unreadable " + cache_file + " (" + type(error).__name__ + ") " + str(error))
+
+        try:
+            with metrics.phase("schema_compile"):
+                if self.engine == "xmlschema":
+                    ret_value = lazy_import("xmlschema").XMLSchema(schema_file)
+                else:
+                    etree = lazy_import("lxml.etree")
+                    ret_value = etree.XMLSchema(etree.parse(schema_file))
+            logger.debug("SCHEMA: Compiled {}", schema_file)
+        except (Exception, BaseException) as error:
+            logger.error("SCHEMA: Unable to compile " + schema_file + " (" + type(error).__name__ + ") " + str(error))
+            return ret_value
+
+        if cache_file is not None:
+            try:
+                temp_file = cache_file + "." + str(os.getpid()) + ".tmp"
+                with open(temp_file, mode='wb') as file:
+                    pickle.dump(ret_value, file, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temp_file, cache_file)
+                logger.debug("SCHEMA: Saved compiled {}", cache_file)
+            except (Exception, BaseException) as error:
+                logger.warning("SCHEMA: Unable to save " + cache_file + " (" + type(error).__name__ + ") " + str(error))
+
+        return ret_value
+
+    def validate(self, source, model, oscal_version):
+        """
+        Validates a document against the schema for its model and OSCAL version.
+
+        Parameters:
+        - source: A file name, a binary or text stream, or the document's root element
+          (ElementTree or lxml)
+        - model (str): The OSCAL model name (root element)
+        - oscal_version (str): The document's /metadata/oscal-version
+
+        Returns:
+        - (valid, errors): a boolean and a list of error messages (at most max_errors)
+        """
+        schema = self.get(model, oscal_version)
+        if schema is None:
+            return (False, ["No usable " + model + " schema for OSCAL " + oscal_version])
+
+        errors = []
+        with metrics.phase("validate"):
+            if self.engine == "xmlschema":
+                for error in schema.iter_errors(source):
+                    errors.append(_error_message(error.reason, error.path, error.sourceline))
+                    if len(errors) >= self.max_errors:
+                        break
+            else:
+                document = _lxml_document(source)
+                if not schema.validate(document):
+                    errors = [_error_message(error.message, error.path, error.line) for error in list(schema.error_log)[:self.max_errors]]
+        metrics.count("documents_validated")
+
+        return (len(errors) == 0, errors)
+
+    def validate_file(self, file_name):
+        """
+        Validates an OSCAL XML file against the schema for the model and
+        OSCAL version found in the file.
+
+        Returns:
+        - dict with the file, model, oscal_version, valid, errors and seconds
+        """
+        start = time.perf_counter()
+        (model, oscal_version) = document_info(file_name)
+        if model not in OSCAL_MODELS or not oscal_version:
+            (valid, errors) = (False, ["Not an OSCAL XML document with an oscal-version"])
+        else:
+            try:
+                (valid, errors) = self.validate(file_name, model, oscal_version)
+            except (Exception, BaseException) as error:
+                (valid, errors) = (False, ["(" + type(error).__name__ + ") " + str(error)])
+
+        return {"file": file_name, "model": model, "oscal_version": oscal_version, "valid": valid, "errors": errors,
+                "seconds": round(time.perf_counter() - start, 4)}
+
+
+def default_engine():
+    """
+    Returns "xmlschema" when it is installed (its compiled schemas can be
+    cached on disk), otherwise "lxml".
+    """
+    try:
+        lazy_import("xmlschema")
+        return "xmlschema"
+    except ImportError:
+        return "lxml"
+
+
+def _error_message(reason, path, line):
+    ret_value = str(reason)
+    if path:
+        ret_value += " (" + str(path) + ")"
+    if line:
+        ret_value += " [line " + str(line) + "]"
+    return ret_value
+
+
+def _lxml_document(source):
+    etree = lazy_import("lxml.etree")
+    if isinstance(source, etree._Element):
+        return source
+    elif ElementTree.iselement(source):
+        return etree.fromstring(ElementTree.tostring(source))
+    elif isinstance(source, io.TextIOBase):
+        return etree.fromstring(source.read().encode("utf-8"))
+    return etree.parse(source)
+
+
+def document_info(file_name):
+    """
+    Reads the model name (root element) and /metadata/oscal-version of an
+    OSCAL XML file, stopping as soon as the version is found.
+
+    Returns:
+    - (model, oscal_version); empty strings for what was not found
+    """
+    model = ""
+    oscal_version = ""
+    depth = 0
+    try:
+        for (event, element) in ElementTree.iterparse(file_name, events=("start", "end")):
+            name = element.tag.rpartition("}")[2]
+            if event == "start":
+                depth += 1
+                if depth == 1:
+                    model = name
+            else:
+                depth -= 1
+                if name == "oscal-version" and depth == 2:
+                    oscal_version = (element.text or "").strip()
+                    break
+                elif name == "metadata" and depth == 1:
+                    break
+    except (Exception, BaseException) as error:
+        logger.error("Unable to read " + file_name + " (" + type(error).__name__ + ") " + str(error))
+
+    return (model, oscal_version)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# BATCH VALIDATION
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# The schema cache of a batch validation worker process
+_worker_schemas = None
+
+def _init_validate_worker(schema_dir, cache_dir, engine, max_errors):
+    global _worker_schemas
+    _worker_schemas = SchemaCache(schema_dir, cache_dir, engine, max_errors)
+
+
+def _validate_job(file_name):
+    return _worker_schemas.validate_file(file_name)
+
+
+def validate_files(files, schemas, workers=None):
+    """
+    Validates many OSCAL XML files in a process pool.
+    The schemas the files need are compiled (or loaded) once in this process
+    first, which also saves them for the workers to load, so no schema is
+    compiled more than once even though every worker has its own cache.
+
+    Parameters:
+    - files (list): The file names
+    - schemas (SchemaCache): The schema cache whose settings the workers use
+    - workers (int)[optional]: The number of worker processes (default: CPU count)
+
+    Returns:
+    - dict with the per-file results and a summary
+    """
+    start = time.perf_counter()
+    for (model, oscal_version) in set([document_info(file_name) for file_name in files]):
+        if model in OSCAL_MODELS and oscal_version:
+            schemas.get(model, oscal_version)
+
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_validate_worker,
+                                                initargs=(schemas.schema_dir, schemas.cache_dir, schemas.engine, schemas.max_errors)) as pool:
+        for result in pool.map(_validate_job, files):
+            if result["valid"]:
+                logger.info("VALID   " + result["file"] + " (" + str(result["seconds"]) + "s)")
+            else:
+                logger.warning("INVALID " + result["file"] + ": " + "; ".join(result["errors"][:3]))
+            results.append(result)
+
+    seconds = time.perf_counter() - start
+    valid = len([result for result in results if result["valid"]])
+    summary = {"files": len(results), "valid": valid, "invalid": len(results) - valid, "engine": schemas.engine,
+               "seconds": round(seconds, 4),
+               "files_per_second": round(len(results) / seconds, 2) if seconds > 0 else 0}
+    logger.info("VALIDATION SUMMARY: " + json.dumps(summary))
+
+    return {"results": results, "summary": summary}
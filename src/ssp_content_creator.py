@@ -1,19 +1,72 @@
 from loguru import logger
-from saxonche import *
 # from lxml import etree as ET
-import elementpath
-from elementpath.xpath3 import XPath3Parser
 from xml.etree import ElementTree
-from xml.dom import minidom
 from common import *
+from metrics import metrics
+from oscal_backends import xpath_cache, get_backend, lazy_import
+from catalog_index import CatalogIndex, CatalogSnapshots, iter_catalog_controls
+from ssp_index import ImplementationIndex, insert_after, insert_before, insert_child, insert_children
+from node_index import NodeIndex, is_element_path, normalize_path
+from oscal_schema import SchemaCache, OSCAL_MODELS, document_info, validate_files
+import re
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import concurrent.futures
+import itertools
+
+log_level = "INFO"
+control_limit = 5                   # stop after this many controls (None for the whole catalog)
+skipped_controls = ["ac-1", "ac-2"]
+log_file = "logs/app_{time}.log"
+
+# Debug records whose arguments are costly to build; the lambdas passed to it
+# are only called when a sink accepts DEBUG records.
+lazy_logger = logger.opt(lazy=True)
+
+# Sink ids added by configure_logging; the only sinks it removes
+_logging_sinks = []
+
+def configure_logging(level=log_level, log_file=log_file, replace_default=False):
+    """
+    Adds a console sink and (optionally) a log file sink, both at the given
+    level, replacing the sinks added by an earlier call. Sinks added by anyone
+    else are left alone. Only called by main() so that importing this module
+    never touches the logging configuration; library users may call it to
+    pick a level.
+
+    Records below the level of every sink are discarded before their message
+    is formatted, so with the default INFO level the per-control DEBUG records
+    cost next to nothing. Use "DEBUG" to trace every XPath query and element.
+
+    Parameters:
+    - level (str)[optional]: The minimum level logged ("DEBUG", "INFO", "WARNING", ...)
+    - log_file (str)[optional]: The log file name pattern (None for console only)
+    - replace_default (bool)[optional]: Also remove loguru's default console sink
+      (the command line does, so records are not printed twice)
+
+    Returns:
+    - The list of sink ids added
+    """
+    try:
+        logger.level("DATABASE")
+    except ValueError:
+        logger.level("DATABASE", no=38, color="<blue>")
+    # log_format = "<green>{time:YYYY-MM-DD HH:mm:ss.SSS zz}</green> | <level>{level: <8}</level> | <yellow>Line {line: >4} ({file}):</yellow> <b>{message}</b>"
+    for sink_id in _logging_sinks + ([0] if replace_default else []):
+        try:
+            logger.remove(sink_id)
+        except ValueError:
+            pass    # already removed
+    ret_value = [logger.add(sys.stderr, level=level)]
+    if log_file:
+        ret_value.append(logger.add(log_file, level=level, rotation="5 MB", retention="12 hours", enqueue=True))
+    _logging_sinks[:] = ret_value
+    return ret_value
 
-log_level = "DEBUG"
-new_level = logger.level("DATABASE", no=38, color="<blue>")
-# log_format = "<green>{time:YYYY-MM-DD HH:mm:ss.SSS zz}</green> | <level>{level: <8}</level> | <yellow>Line {line: >4} ({file}):</yellow> <b>{message}</b>"
-logger.add("logs/app_{time}.log", level=log_level, rotation="5 MB", retention="12 hours", enqueue=True)
-logger.debug("Start")
-
-OSCAL_DEFAULT_NAMESPACE = "http://csrc.nist.gov/ns/oscal/1.0"
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 # OSCAL CLASS
@@ -27,46 +80,66 @@ Properties:
 - valid_xml: A boolean indicating whether the content was found to be well-formed XML
 - xml_namespace: The identified default namespace
 - valid_oscal: A boolean indicating whether the content was found to OSCAL schema valid
-  - Currently, valid just means a recognized OSCAL model name (root) and OSCAL version (/metadata/oscal-veraion)
+  - With a schema cache, XML content is validated against the NIST OSCAL XML schema for its model and version
+  - Without one, valid just means a recognized OSCAL model name (root) and OSCAL version (/metadata/oscal-version)
+- validation_errors: The schema validation errors found by OSCAL_validate (at most the schema cache's max_errors)
+- schemas: The SchemaCache used by OSCAL_validate (None: no schema validation)
 - oscal_format: The recognized OSCAL format ("xml", "json" or "yaml")
-  - Currently, the value will only be XML as the class only accepts XML. 
+  - Currently "xml" or "json". JSON content is read incrementally into catalog_index and
+    has no tree, so the XPath and append methods are only available for XML.
   - Phase 3: Accept all three formats
 - oscal_version: The value in the /metadata/oscal-version field
 - oscal_model: The OSCAL model name exatly as it appears in OSCAL syntax
   ["catalog", "profile", "component-definition", "system-security-plan", "assessment-plan", "assessment-results", "plan-of-action-and-milestones"]
 - doc: The lxml representation of the content
+- catalog_index: For a JSON catalog, the CatalogIndex built while parsing it (otherwise None)
+- xpath_cache: The XPathCache holding compiled expressions (shared process-wide by default)
+- backend: The XML backend used to parse, query and serialize the content ("stdlib", "lxml" or "saxon")
+  - The saxon backend is read-only (XPath 3.1 queries); append_child is not available with it
+- index: A NodeIndex of the document's elements by id, uuid, control-id and element path
+  - Built on first use and kept current by append_child and add_element; None with the saxon backend
     """
-    def __init__(self, content):
+    def __init__(self, content, xpath_cache=xpath_cache, backend="stdlib", schemas=None):
         self.content = content
         self.valid_xml = False
         self.xml_namespace = ""
         self.valid_oscal = False
+        self.validation_errors = []
+        self.schemas = schemas
         self.oscal_format = ""
         self.oscal_version = ""
         self.oscal_model = ""
         self.tree = None
         self.nsmap = {"": OSCAL_DEFAULT_NAMESPACE}
-        self.__saxon = None
+        self.xpath_cache = xpath_cache
+        self.backend = get_backend(backend)
+        self.__index = None
+        self.catalog_index = None
+
+        if content.lstrip("\ufeff \t\r\n").startswith("{"):
+            self.__load_json(content)
+            return
 
         # check for XML validity
         try:
-            self.tree = ElementTree.fromstring(content.encode('utf_8'))
+            with metrics.phase("parse"):
+                self.tree = self.backend.parse(content)
             self.valid_xml = True
-        except ElementTree.XMLSyntaxError as e:
+        except ValueError as e:
             logger.debug("CONTENT DOES NOT APPEAR TO BE VALID XML")
-            for entry in e.error_log:
-                    logger.error(f"Error: {entry.message} (Line: {entry.line}, Column: {entry.column})")
+            logger.error("Error: " + str(e))
 
 
         if self.valid_xml:
             logger.debug("Content appears to be well-formed XML")
-            logger.debug(self.tree.tag)
-            root_element = self.xpath_atomic("/*/name()")
-            logger.debug("ROOT ELEMENT: " + str(root_element))
-            if root_element in ["catalog", "profile", "component-definition", "system-security-plan", "assessment-plan", "assessment-results", "plan-of-action-and-milestones"]:
-                logger.debug("OSCAL ROOT ELEMENT DETECTED: " + root_element)
-                self.oscal_version = self.xpath_atomic("//metadata/oscal-version/text()")
-                logger.debug("OSCAL_VERSION: " + str(self.oscal_version))
+            self.oscal_format = "xml"
+            root_element, oscal_version = self.backend.document_info(self.tree, self.nsmap)
+            logger.debug("ROOT ELEMENT: {}", root_element)
+            if root_element in OSCAL_MODELS:
+                logger.debug("OSCAL ROOT ELEMENT DETECTED: {}", root_element)
+                self.oscal_model = root_element
+                self.oscal_version = oscal_version
+                logger.debug("OSCAL_VERSION: {}", self.oscal_version)
                 if len(self.oscal_version) >= 5: # TODO: Look up value in list of known-valid OSCAL versions
                     self.OSCAL_validate()
             else:
@@ -74,14 +147,56 @@ Properties:
 
 
 
-    def OSCAL_validate(self):
+    def __load_json(self, content):
+        info = {}
+        try:
+            with metrics.phase("parse"):
+                catalog_index = CatalogIndex.from_json(io.BytesIO(content.encode("utf-8")), info)
+        except (Exception, BaseException) as error:
+            logger.debug("CONTENT DOES NOT APPEAR TO BE VALID JSON")
+            logger.error("Error: (" + type(error).__name__ + ") " + str(error))
+            return
+
+        self.oscal_format = "json"
+        root_element = info.get("oscal_model", "")
+        if root_element in OSCAL_MODELS:
+            logger.debug("OSCAL ROOT OBJECT DETECTED: {}", root_element)
+            self.oscal_model = root_element
+            self.oscal_version = info.get("oscal_version", "")
+            if root_element == "catalog":
+                self.catalog_index = catalog_index
+            if len(self.oscal_version) >= 5:
+                self.OSCAL_validate()
+        else:
+            logger.error("ROOT OBJECT IS NOT AN OSCAL MODEL: " + root_element)
+
+    def OSCAL_validate(self, schemas=None):
         """
-        Currently does nothing.
-        Will soon validate OSCAL XML content using the appropriate NIST OLSCAL XML Schema file for the specified OSCAL model and version.
+        Validates OSCAL XML content using the NIST OSCAL XML Schema file for the
+        OSCAL model and version, from the schema cache passed or given to the
+        constructor. The compiled schema is cached, so validating many
+        documents only compiles it once.
+        Without a schema cache the content is only checked for a recognized
+        model and version. JSON content is not schema validated yet.
         Eventually will use metaschema definitions to validate.
+
+        Parameters:
+        - schemas (SchemaCache)[optional]: The schema cache to use (default: self.schemas)
+
+        Returns:
+        - valid_oscal
         """
-        self.valid_oscal = True
-        pass
+        schemas = schemas or self.schemas
+        self.validation_errors = []
+        if schemas is None or self.oscal_format != "xml":
+            self.valid_oscal = True
+        else:
+            source = self.tree if self.backend.mutable else io.StringIO(self.content)
+            (self.valid_oscal, self.validation_errors) = schemas.validate(source, self.oscal_model, self.oscal_version)
+            if not self.valid_oscal:
+                logger.error("NOT VALID " + self.oscal_model + " (OSCAL " + self.oscal_version + "): " + "; ".join(self.validation_errors[:3]))
+
+        return self.valid_oscal
 
 
     def OSCAL_convert(self, directive):
@@ -92,112 +207,18 @@ Properties:
         """
         pass
 
-    def __setup_saxon(self): # Future - place holder for code for now
-        self.__saxon = PySaxonProcessor(license=False)
-        try: 
-            self.xdm = self.__saxon.parse_xml(xml_text=content)
-            # self.__saxon.declare_namespace("", "http://csrc.nist.gov/ns/oscal/1.0")
-            self.valid = True
-            self.oscal_format = "xml"
-        except:
-            logger.error("Content does not appear to be valid XML. Unable to rpoceed")
-
-        if self.valid:
-            self.xp = self.__saxon.new_xpath_processor() # Instantiates XPath processing
-            self.handle_ns()
-            self.xp.set_context(xdm_item=self.xdm) # Sets xpath processing context as the whole file
-            temp_ret = self.xpath_global("/*/name()")
-            if temp_ret is not None:
-                self.root_node = temp_ret[0].get_atomic_value().string_value
-                logger.debug("ROOT: " + self.root_node)
-            self.oscal_version = self.xpath_global_single("/*/*:metadata/*:oscal-version/text()")
-            logger.debug("OSCAL VERSION: " + self.oscal_version)
-
-    def __saxon_serializer(self):
-        return self.xdm.to_string('utf_8')
-
-
-    def __saxon_handle_ns(self):
-        node_ = self.xdm
-        child = node_.children[0]
-        assert child is not None
-        namespaces = child.axis_nodes(8)
-
-        for ns in namespaces:
-            uri_str = ns.string_value
-            ns_prefix = ns.name
-
-            if ns_prefix is not None:
-                logger.debug("xmlns:" + ns_prefix + "='" + uri_str + "'")
-            else:
-                logger.debug("xmlns uri=" + uri_str + "'")
-                # set default ns here
-                self.xp.declare_namespace("", uri_str)
-
-
-    def __saxon_xpath_global(self, expression):
-        ret_value = None
-        logger.debug("Global Evaluating: " + expression)
-        ret = self.xp.evaluate(expression)
-        if  isinstance(ret,PyXdmValue):
-            logger.debug("--Return Size: " + str(ret.size))
-            ret_value = ret
-        else:
-            logger.debug("--No result")
-
-        return ret_value
-
-    def __saxon_xpath_global_single(self, expression):
-        ret_value = ""
-        logger.debug("Global Evaluating Single: " + expression)
-        ret = self.xp.evaluate_single(expression)
-        if  isinstance(ret, PyXdmValue): # isinstance(ret,PyXdmNode):
-            ret_value = ret.string_value
-        else:
-            logger.debug("--No result")
-            logger.debug("TYPE: " + str(type(ret)))
-
-        return ret_value
-
-
-    def __saxon_xpath(self, context, expression):
-        ret_value = None
-        logger.debug("Evaluating: " + expression)
-        xp = self.__saxon.new_xpath_processor() # Instantiates XPath processing
-        xp.set_context(xdm_item=context)
-        ret = xp.evaluate(expression)
-        if  isinstance(ret,PyXdmValue):
-            logger.debug("--Return Size: " + str(ret.size))
-            ret_value = ret
-        else:
-            logger.debug("--No result")
-
-        return ret_value
-
-    def __saxon_xpath_single(self, context, expression):
-        ret_value = ""
-        logger.debug("Evaluating Single: " + expression)
-        xp = self.__saxon.new_xpath_processor() # Instantiates XPath processing
-        xp.set_context(xdm_item=context)
-        ret = xp.evaluate_single(expression)
-        if  isinstance(ret, PyXdmValue): # isinstance(ret,PyXdmNode):
-            ret_value = ret.string_value
-        else:
-            logger.debug("--No result")
-            logger.debug("TYPE: " + str(type(ret)))
-
-        return ret_value
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
     
     def xpath_atomic(self, xExpr, context=None):
         ret_value=""
+        metrics.count("xpath_evaluations")
         if context is None:
-            logger.debug("XPath [1]: " + xExpr)
-            ret_value = elementpath.select(self.tree, xExpr, namespaces=self.nsmap)[0]
+            logger.debug("XPath [1]: {}", xExpr)
+            ret_value = self.xpath_cache.selector(xExpr, self.nsmap, self.backend)(self.tree)[0]
         else:
-            logger.debug("XPath [1] (" + context.tag + "): " + xExpr)
-            ret_value = elementpath.select(context, xExpr, namespaces=self.nsmap)[0]
+            lazy_logger.debug("XPath [1] ({}): {}", lambda: node_name(context), lambda: xExpr)
+            ret_value = self.xpath_cache.selector(xExpr, self.nsmap, self.backend)(context)[0]
 
         return str(ret_value)
 
@@ -219,25 +240,83 @@ Properties:
         """
         
         ret_value=None
+        metrics.count("xpath_evaluations")
         if context is None:
-            logger.debug("XPath [1]: " + xExpr)
-            ret_value = elementpath.select(self.tree, xExpr, namespaces=self.nsmap)
+            logger.debug("XPath [1]: {}", xExpr)
+            ret_value = self.xpath_cache.selector(xExpr, self.nsmap, self.backend)(self.tree)
         else:
-            logger.debug("XPath [1] (" + context.tag + "): " + xExpr)
-            ret_value = elementpath.select(context, xExpr, namespaces=self.nsmap)
-        logger.debug(str(type(ret_value)))
+            lazy_logger.debug("XPath [1] ({}): {}", lambda: node_name(context), lambda: xExpr)
+            ret_value = self.xpath_cache.selector(xExpr, self.nsmap, self.backend)(context)
+        lazy_logger.debug("XPath results: {}", lambda: len(ret_value))
         return ret_value
 
-    def serializer(self):
+    def serializer(self, pretty_print=True):
+        """
+        Returns the document as a string. Prefer serialize_to for large
+        documents; it never holds the serialized document in memory.
+        """
         logger.debug("Serializing for Output")
-        ElementTree.indent(self.tree)
-        out_string = ElementTree.tostring(self.tree, 'utf-8')
-        logger.debug("LEN: " + str(len(out_string)))
-        out_string = normalize_content(out_string)
-        out_string = out_string.replace("ns0:", "")
-        out_string = out_string.replace(":ns0", "")
-        
+        out_stream = io.BytesIO()
+        self.serialize_to(out_stream, pretty_print)
+        out_string = normalize_content(out_stream.getvalue())
+        logger.debug("LEN: {}", len(out_string))
+
         return out_string
+
+    def serialize_to(self, destination, pretty_print=True):
+        """
+        Writes the document incrementally to a file or binary stream as UTF-8,
+        with the OSCAL namespace written as the default namespace.
+        No intermediate copy of the serialized document is made.
+
+        Parameters:
+        - destination (str or obj): A file name or a binary stream
+        - pretty_print (bool)[optional]: Indent the document (modifies the tree in place)
+
+        Returns:
+        - The number of bytes written (0 on error)
+        """
+        ret_value = 0
+        logger.debug("Serializing to {}", destination)
+        with metrics.phase("serialize"):
+            if pretty_print:
+                self.backend.indent(self.tree)
+            try:
+                if isinstance(destination, str):
+                    with open(destination, mode='wb') as file:
+                        ret_value = self.__write(file)
+                else:
+                    ret_value = self.__write(destination)
+            except (Exception, BaseException) as error:
+                logger.error("Error serializing to " + str(destination) + " (" + type(error).__name__ + ") " + str(error))
+                ret_value = 0
+            metrics.count("bytes_written", ret_value)
+
+        logger.debug("BYTES WRITTEN: {}", ret_value)
+        return ret_value
+
+    @property
+    def index(self):
+        if self.__index is None and self.tree is not None and self.backend.mutable:
+            with metrics.phase("node_index"):
+                self.__index = NodeIndex(self.tree)
+        return self.__index
+
+    def find_node(self, xExpr):
+        """
+        Returns the first node selected by an xpath expression or None.
+        Element paths and //name[@id|uuid|control-id='value'] expressions are
+        answered from the index; anything else is evaluated as XPath.
+        """
+        nodes = self.index.select(xExpr) if self.index is not None else None
+        if nodes is None:
+            nodes = self.xpath(xExpr)
+        return nodes[0] if nodes else None
+
+    def __write(self, stream):
+        counter = ByteCounter(stream)
+        self.backend.write(self.tree, counter, self.nsmap)
+        return counter.bytes_written
     
     def lookup(self, xExpr: str, attributes: list=[], children: list=[]):
         """
@@ -253,52 +332,58 @@ Properties:
         Return:
         - dict or None
         dict = {
-           {'attribute/field name', 'value'},
-           {'attribute/field name', 'value'}        
+           'attribute/field name': 'value',
+           'attribute/field name': 'value'
         }
         """
         ret_value = None
-        target_node = self.xpath(xExpr)
-        if target_node:
+        target_node = self.find_node(xExpr)
+        if target_node is not None and hasattr(target_node, "attrib"):
             ret_value = {}
             if 'id' in target_node.attrib:
-                ret_value.append({"id", target_node.get("id")})
+                ret_value["id"] = target_node.get("id")
             if 'uuid' in target_node.attrib:
-                ret_value.append({"uuid", target_node.get("uuid")})
+                ret_value["uuid"] = target_node.get("uuid")
 
             title = target_node.find('./title', self.nsmap)
-            if title:
-                ret_value.append({"title", title.text})
+            if title is not None:
+                ret_value["title"] = title.text
 
             for attribute in attributes:
-                ret_value.append({attribute, target_node.get(attribute)})
+                if attribute in target_node.attrib:
+                    ret_value[attribute] = target_node.get(attribute)
 
             for child in children:
                 child_node = target_node.find('./' + child, self.nsmap)
-                if child_node:
-                    ret_value.append({child, child_node.text})
+                if child_node is not None:
+                    ret_value[child] = child_node.text
 
 
         return ret_value
 
     def append_child(self, xpath, node_name, node_content = None, attribute_list = []):
-        # logger.debug("APPENDING " + node_name + " as child to " + xpath) #  + " in " + self.tree.tag)
+        logger.debug("APPENDING {} as child to {}", node_name, xpath)
         status = False
+        if not self.backend.mutable:
+            logger.error("APPEND: The " + self.backend.name + " backend is read-only")
+            return None
         try:
-            parent_node = self.tree.find(xpath, namespaces=self.nsmap)
-            # parent_node = self.xpath(xpath)
-            logger.debug(parent_node)
+            parent_node = self.index.find(xpath)
+            if parent_node is None:
+                parent_node = self.tree.find(xpath, namespaces=self.nsmap)
             if parent_node is not None:
-                logger.debug("TAG: " + parent_node.tag)
-                child = ElementTree.Element(node_name)
+                logger.debug("TAG: {}", parent_node.tag)
+                child = parent_node.makeelement(child_tag(parent_node, node_name), {})
 
-                if node_content is str:
+                if isinstance(node_content, str):
                     child.text = node_content
 
                 for attrib in attribute_list:
                     child.set(attrib[0], attrib[1])
 
                 parent_node.append(child)
+                self.__index_added([child], xpath, parent_node)
+                metrics.count("elements_created")
                 status = True
             else:
                 logger.warning("APPEND: Unable to find " + xpath )
@@ -310,131 +395,1102 @@ Properties:
         else:
             return None
 
+    def add_element(self, xpath, element, parent_node=None, before_names=None, after_node=None, before_node=None):
+        """
+        Adds an element (with any descendants) built outside the document as
+        a child of the element at an element path, and indexes it.
+
+        Parameters:
+        - xpath (str): The element path of the parent, e.g. "control-implementation"
+        - element (obj): The element to add
+        - parent_node (obj)[optional]: The parent element, when there is more than one at the path
+        - before_names (list)[optional]: Insert before the first child with one of these
+          names (keeps the OSCAL element order); appended if absent or none is found
+        - after_node (obj)[optional]: Insert right after this child of the parent instead
+        - before_node (obj)[optional]: Insert right before this child of the parent instead
+
+        Returns:
+        - The element, or None if the parent was not found
+        """
+        if not self.backend.mutable:
+            logger.error("ADD: The " + self.backend.name + " backend is read-only")
+            return None
+        if parent_node is None:
+            parent_node = self.index.find(xpath)
+        if parent_node is None:
+            logger.warning("ADD: Unable to find " + xpath)
+            return None
+        if after_node is not None:
+            insert_after(parent_node, element, after_node)
+        elif before_node is not None:
+            insert_before(parent_node, element, before_node)
+        elif before_names:
+            insert_child(parent_node, element, before_names)
+        else:
+            parent_node.append(element)
+        self.__index_added([element], xpath, parent_node)
+        return element
+
+    def add_elements(self, xpath, elements, parent_node=None, before_names=None):
+        """
+        Appends a list of elements built outside the document to the element
+        at an element path with a single extend, and indexes them.
+        With before_names, they are inserted together before the first child
+        with one of these names instead (see add_element).
+
+        Returns:
+        - True if the parent was found and the elements were added
+        """
+        if not self.backend.mutable:
+            logger.error("ADD: The " + self.backend.name + " backend is read-only")
+            return False
+        if parent_node is None:
+            parent_node = self.index.find(xpath)
+        if parent_node is None:
+            logger.warning("ADD: Unable to find " + xpath)
+            return False
+        if before_names:
+            insert_children(parent_node, elements, before_names)
+        else:
+            parent_node.extend(elements)
+        if elements:
+            self.__index_added(elements, xpath, parent_node)
+        return True
+
+    def __index_added(self, elements, xpath, parent_node):
+        # New last children of the last element at an element path come last in document
+        # order at every path, so they can simply be added. Otherwise (an insert, or a path
+        # that is not an element path) the index is rebuilt on next use.
+        if self.__index is None:
+            return
+        if is_element_path(xpath) and parent_node[-1] is elements[-1] and self.__index.is_last(parent_node, xpath):
+            for element in elements:
+                self.__index.add(element, normalize_path(xpath))
+        else:
+            self.__index = None
+
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-def append_params(control_obj, implemented_requirement, catalog_obj):
-
-    logger.debug("Looking for Params")
-    params = catalog_obj.xpath("./param", control_obj)
-    # params = control_obj.find("./param", namespaces=nsmap)
-    if params is not None:
-        logger.debug("PARAMS FOUND: " + str(len(params)))
-        for param in params:
-            param_response = ElementTree.Element("set-parameter")
-            param_response.set("param-id", param.get("id"))
-            param_value = ElementTree.Element("value")
-            param_value.text = "placeholder"
-            param_response.append(param_value)
-            implemented_requirement.append(param_response)
-
-
-def append_response_points(control_obj, implemented_requirement, catalog_obj, statement_uuid):
-    uuid_statement_incr = 100
-    uuid_component_incr = 1
-    rp_expansion = "./part[@name='statement']//prop[@name='response-point' and @ns='https://fedramp.gov/ns/oscal']/../@id"
-    logger.debug("Looking for Response Points")
-    r_points = catalog_obj.xpath(rp_expansion, control_obj)
-    logger.debug(r_points)
-    if r_points is not None:
-        logger.debug("RPs FOUND: " + str(len(r_points)))
-        for rp in r_points:
-            statement = ElementTree.Element("statement")
-            statement.set("statement-id", rp)
-            statement.set("uuid", uuid_format(statement_uuid))
-            append_by_component(statement, statement_uuid + uuid_component_incr, 
-                                "11111111-2222-4000-8000-009000000000", 
-                                "This is the 'this-system' component that must be present for every statement")
-            implemented_requirement.append(statement)
-            statement_uuid += uuid_statement_incr
+def node_name(node):
+    """
+    Returns the name of an element (its tag) or XDM node, for log messages.
+    """
+    return str(getattr(node, "tag", getattr(node, "name", "")))
 
 
-def append_by_component(statement, by_component_uuid, component_uuid, content=""):
+def child_tag(parent, name):
+    """
+    Returns the tag for a new child element in the same namespace as its
+    parent, so generated content serializes in the document's default namespace.
+    """
+    if name.startswith("{") or not parent.tag.startswith("{"):
+        return name
+    return parent.tag[:parent.tag.index("}") + 1] + name
 
-    by_component = ElementTree.Element("by-component")
-    by_component.set("component-uuid", component_uuid)
-    by_component.set("uuid", uuid_format(by_component_uuid))
-    description = ElementTree.Element("description")
-    paragraph = ElementTree.Element("p")
-    paragraph.text = content
-    description.append(paragraph)
-    by_component.append(description)
-    statement.append(by_component)
 
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# IMPLEMENTED-REQUIREMENT BUILDER
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
-def process_components(by_component_uuid): # catalog_obj, xpath_expression, control_uuid):
-    comp_out = ""
-    uuid_component_incr = 1
+this_system_uuid = "11111111-2222-4000-8000-009000000000"
+this_system_description = "This is the 'this-system' component that must be present for every statement"
+uuid_statement_incr = 100
+uuid_component_incr = 1
+uuid_generated_component = 20000000000      # generated components: ...-020000000001, ...-020000000002, ...
+uuid_generated_by_component = 21000000000   # their by-components:  ...-021000000001, ...
+generated_component_description = "This is a generated component for load testing."
+generated_by_component_description = "This is how the generated component supports this statement."
 
-    by_component_uuid += uuid_component_incr
-    comp_out += indent(4) + "<by-component component-uuid='11111111-2222-4000-8000-009000000000' uuid='" + uuid_format(by_component_uuid) + "'>\n"
-    comp_out += indent(5) + "<description><p>This is the 'this-system' component.</p></description>\n"
-    comp_out += indent(5) + "<implementation-status state='operational' />\n"
-    comp_out += indent(4) + "</by-component>\n"
+class GeneratedComponents:
+    """
+Generated Components Class
 
-    return comp_out
+The components of the scale-factor mode, used to generate load-test SSPs:
+count components with deterministic UUIDs (via uuid_format), described in
+system-implementation and referenced from the statements. Each statement gets
+per_statement by-components for the next components in turn (round-robin), so
+every component is used once there are enough statements. The assignment
+depends only on the order of the statements, so a run is reproducible.
 
+Properties:
+- count: The number of generated components
+- per_statement: The number of generated by-components in each statement (at most count)
+- uuids: The component UUIDs
+- assigned: The number of by-components assigned so far
+    """
+    TYPES = ["software", "service", "hardware", "policy", "process-procedure"]
 
-def insert_controls(catalog_obj, ssp_obj):
-    logger.debug("Inserting Controls ...")
-    limit = 5
+    def __init__(self, count, per_statement=1):
+        self.count = count
+        self.per_statement = min(per_statement, count)
+        self.uuids = [uuid_format(uuid_generated_component + index + 1) for index in range(count)]
+        self.assigned = 0
+
+    def title(self, index):
+        return "Component " + str(index + 1)
+
+    def type(self, index):
+        return self.TYPES[index % len(self.TYPES)]
+
+    def assign(self):
+        """
+        Returns the (component uuid, by-component uuid) pairs for the next statement.
+        """
+        ret_value = []
+        for _ in range(self.per_statement):
+            ret_value.append((self.uuids[self.assigned % self.count], uuid_format(uuid_generated_by_component + self.assigned + 1)))
+            self.assigned += 1
+        return ret_value
+
+
+class RequirementBuilder:
+    """
+Implemented-Requirement Builder Class
+
+Builds complete implemented-requirement subtrees detached from any document,
+so they can be attached in bulk. The repeated skeletons (set-parameter/value
+and statement/by-component/description/p) are built once as templates and
+deep-copied for each use; only the ids and uuids are set on each copy.
+
+Properties:
+- parent: The element the subtrees are built for (e.g. control-implementation).
+  New elements are made by it, so they suit its backend, in its namespace.
+  None builds plain ElementTree elements in namespace.
+- namespace: The namespace of the new elements when there is no parent
+- component_uuid: The uuid of the component each statement's by-component refers to
+- description: The by-component description text
+- components: GeneratedComponents whose by-components are added to each statement (None: only component_uuid's)
+    """
+    def __init__(self, parent=None, namespace=OSCAL_DEFAULT_NAMESPACE, component_uuid=this_system_uuid, description=this_system_description,
+                 components=None):
+        self.parent = parent
+        self.namespace = namespace
+        self.component_uuid = component_uuid
+        self.description = description
+        self.components = components
+        if parent is not None:
+            self.__makeelement = parent.makeelement
+            self.__ns = child_tag(parent, "")
+        else:
+            self.__makeelement = ElementTree.Element
+            self.__ns = "{" + namespace + "}" if namespace else ""
+
+        self.__set_parameter = self.__element("set-parameter")
+        value = self.__element("value")
+        value.text = "placeholder"
+        self.__set_parameter.append(value)
+
+        self.__statement = self.__element("statement")
+        by_component = self.__element("by-component")
+        by_component.set("component-uuid", component_uuid)
+        description_element = self.__element("description")
+        paragraph = self.__element("p")
+        paragraph.text = description
+        description_element.append(paragraph)
+        by_component.append(description_element)
+        self.__statement.append(by_component)
+
+        if components is not None:
+            self.__by_component = self.__element("by-component")
+            self.__by_component.extend([self.__description(generated_by_component_description), self.__element("implementation-status")])
+            self.__by_component[1].set("state", "operational")
+            self.__component = self.__element("component")
+            self.__component.extend([self.__element("title"), self.__description(generated_component_description), self.__element("status")])
+            self.__component[2].set("state", "operational")
+
+    def __element(self, name):
+        return self.__makeelement(self.__ns + name, {})
+
+    def __description(self, text):
+        description_element = self.__element("description")
+        paragraph = self.__element("p")
+        paragraph.text = text
+        description_element.append(paragraph)
+        return description_element
+
+    def set_parameter(self, param_id):
+        set_parameter = self.__set_parameter.__deepcopy__({})
+        set_parameter.set("param-id", param_id)
+        metrics.count("elements_created", 2)
+        return set_parameter
+
+    def statement(self, statement_id, statement_uuid):
+        statement = self.__statement.__deepcopy__({})
+        statement.set("statement-id", statement_id)
+        statement.set("uuid", uuid_format(statement_uuid))
+        statement[0].set("uuid", uuid_format(statement_uuid + uuid_component_incr))
+        metrics.count("elements_created", 4)
+        if self.components is not None:
+            for (component_uuid, by_component_uuid) in self.components.assign():
+                by_component = self.__by_component.__deepcopy__({})
+                by_component.set("component-uuid", component_uuid)
+                by_component.set("uuid", by_component_uuid)
+                statement.append(by_component)
+            metrics.count("elements_created", 4 * self.components.per_statement)
+        return statement
+
+    def component(self, index):
+        """
+        Returns the system-implementation component for a generated component.
+        """
+        component = self.__component.__deepcopy__({})
+        component.set("uuid", self.components.uuids[index])
+        component.set("type", self.components.type(index))
+        component[0].text = self.components.title(index)
+        metrics.count("elements_created", 5)
+        return component
+
+    def implemented_requirement(self, control, uuid_cntr):
+        """
+        Returns the implemented-requirement for a control: a set-parameter for
+        each param and a statement (with one by-component) for each response point.
+        """
+        implemented_requirement = self.__element("implemented-requirement")
+        implemented_requirement.set("control-id", control.id)
+        implemented_requirement.set("uuid", uuid_format(uuid_cntr))
+        metrics.count("elements_created")
+        logger.debug("PARAMS FOUND: {}", len(control.params))
+        logger.debug("RPs FOUND: {}", len(control.response_points))
+        children = [self.set_parameter(param_id) for param_id in control.params]
+        statement_uuid = uuid_cntr
+        for rp in control.response_points:
+            children.append(self.statement(rp, statement_uuid))
+            statement_uuid += uuid_statement_incr
+        implemented_requirement.extend(children)
+
+        return implemented_requirement
+
+    def build_all(self, selected_controls):
+        """
+        Builds the implemented-requirements for (ControlEntry, uuid suffix)
+        pairs, as yielded by select_controls, in one pass.
+
+        Returns:
+        - list of implemented-requirement elements
+        """
+        ret_value = []
+        with metrics.phase("build"):
+            for control, uuid_cntr in selected_controls:
+                metrics.count("controls_processed")
+                ret_value.append(self.implemented_requirement(control, uuid_cntr))
+        return ret_value
+
+
+def select_controls(controls):
+    """
+    Applies the control selection rules shared by the in-memory and streaming
+    generation modes.
+
+    Parameters:
+    - controls (iterable): ControlEntry objects in document order
+
+    Returns:
+    - generator of (ControlEntry, uuid suffix) tuples for the controls to generate
+    """
+    limit = control_limit
     limit_cntr = 0
-    ssp_control_output = ""
     uuid_cntr=12000000000
     uuid_control_incr = 10000
+
+    for control in controls:
+        uuid_cntr += uuid_control_incr
+        if control.id not in skipped_controls:
+            logger.debug("CONTROL: {}", control.id)
+            yield control, uuid_cntr
+        else:
+            logger.debug("Skipping  {}", control.id)
+
+        limit_cntr += 1
+        if limit is not None and limit_cntr > limit: break
+
+
+def insert_controls(catalog_index, ssp_obj, components=None):
+    logger.debug("Inserting Controls ...")
     status = False
 
-    xpath_expression = "//control"
-    controls = catalog_obj.xpath(xpath_expression)
-    if controls is not None: # isinstance(controls,PyXdmValue):
-        logger.debug("SIZE: " + str(len(controls)))
-        for control_obj in controls:
-            uuid_cntr += uuid_control_incr
-            control_id = (catalog_obj.xpath_atomic("./@id", context=control_obj)).strip()
-            if control_id not in ["ac-1", "ac-2"]:
-                logger.debug("CONTROL: " + control_id)
-                attributes = [["control-id", control_id], ["uuid", uuid_format(uuid_cntr)]]
-                implemented_requirement = ssp_obj.append_child("control-implementation" , "implemented-requirement", node_content = None, attribute_list = attributes)
-
-                if implemented_requirement is not None:
-                    append_params(control_obj, implemented_requirement, catalog_obj)
-                    append_response_points(control_obj, implemented_requirement, catalog_obj, uuid_cntr)
+    logger.debug("SIZE: {}", len(catalog_index))
+    control_implementation = ssp_obj.index.find("control-implementation") if ssp_obj.index is not None else None
+    if control_implementation is None:
+        logger.error("INSERT: The SSP has no control-implementation")
+        return status
+
+    builder = RequirementBuilder(control_implementation, components=components)
+    if components is not None:
+        system_implementation = ssp_obj.index.find("system-implementation")
+        if system_implementation is None:
+            logger.error("INSERT: The SSP has no system-implementation for the generated components")
+            return status
+        with metrics.phase("build"):
+            generated = [builder.component(index) for index in range(components.count)]
+        ssp_obj.add_elements("system-implementation", generated, system_implementation, ["inventory-item", "remarks"])
+
+    with metrics.phase("traverse"):
+        implemented_requirements = builder.build_all(select_controls(catalog_index))
+        if implemented_requirements:
+            status = ssp_obj.add_elements("control-implementation", implemented_requirements, control_implementation)
 
+    return status
+
+
+def update_controls(catalog_index, ssp_obj):
+    """
+    Incremental generation mode. The SSP's existing implemented-requirement,
+    set-parameter and statement entries are indexed once, then only the
+    implemented-requirements, set-parameters and statements that are missing
+    for the selected catalog controls are added. Existing content is never
+    changed. New entries get the same UUIDs and positions a full generation
+    would give them: a missing implemented-requirement goes right after the
+    one for the previous selected catalog control (or before the one for the
+    next, if there is no previous one).
+
+    Returns:
+    - True if the SSP has a control-implementation to update
+    """
+    logger.debug("Updating Controls ...")
+    with metrics.phase("index"):
+        implementation_index = ImplementationIndex(ssp_obj)
+    if implementation_index.control_implementation is None:
+        logger.error("UPDATE: The SSP has no control-implementation")
+        return False
+
+    builder = RequirementBuilder(implementation_index.control_implementation)
+    with metrics.phase("traverse"):
+        selected = list(select_controls(catalog_index))
+        previous_requirement = None
+        for position, (control, uuid_cntr) in enumerate(selected):
+            metrics.count("controls_processed")
+            entry = implementation_index.get(control.id)
+            if entry is None:
+                with metrics.phase("build"):
+                    implemented_requirement = builder.implemented_requirement(control, uuid_cntr)
+                following = None
+                if previous_requirement is None:
+                    following = next((implementation_index.get(later.id).element for (later, _) in selected[position + 1:]
+                                      if later.id in implementation_index), None)
+                ssp_obj.add_element("control-implementation", implemented_requirement, implementation_index.control_implementation,
+                                    after_node=previous_requirement, before_node=following)
+                previous_requirement = implementation_index.add(implemented_requirement).element
+                metrics.count("controls_added")
+                continue
+            previous_requirement = entry.element
+
+            # A missing entry goes right after the one for the previous catalog param
+            # (response point), so the order matches a full generation
+            updated = False
+            with metrics.phase("build"):
+                previous = None
+                for param_id in control.params:
+                    if param_id not in entry.set_parameters:
+                        set_parameter = builder.set_parameter(param_id)
+                        ssp_obj.add_element("control-implementation/implemented-requirement", set_parameter, entry.element,
+                                            ["set-parameter", "responsible-role", "statement", "by-component", "remarks"], previous)
+                        implementation_index.add_set_parameter(control.id, set_parameter)
+                        updated = True
+                    previous = entry.set_parameters[param_id]
+                previous = None
+                for index, rp in enumerate(control.response_points):
+                    if rp not in entry.statements:
+                        statement = builder.statement(rp, uuid_cntr + index * uuid_statement_incr)
+                        ssp_obj.add_element("control-implementation/implemented-requirement", statement, entry.element,
+                                            ["statement", "by-component", "remarks"], previous)
+                        implementation_index.add_statement(control.id, statement)
+                        updated = True
+                    previous = entry.statements[rp]
+            metrics.count("controls_updated" if updated else "controls_unchanged")
+
+    return True
+
+
+def stream_controls(catalog_source, ssp_content, output_file, components=None, backend="stdlib"):
+    """
+    Streaming generation mode. The catalog is read incrementally and each
+    implemented-requirement is written to the output file as soon as it is
+    built, spliced into the base SSP content just before the closing
+    control-implementation tag. Neither the catalog nor the generated SSP
+    is ever held in memory as a whole. Generated components are written the
+    same way after the base SSP's last system-implementation component.
+
+    Parameters:
+    - catalog_source (str or obj): Catalog file name or file object
+    - ssp_content (str): The base SSP content
+    - output_file (str): The file to create
+    - components (GeneratedComponents)[optional]: Components to add (scale-factor mode)
+    - backend (str)[optional]: The backend that builds and serializes the new elements ("stdlib" or "lxml";
+      lxml serializes much faster, which matters for large scale-factor SSPs)
+
+    Returns:
+    - True if at least one implemented-requirement was written
+    """
+    logger.debug("Streaming Controls ...")
+    status = False
+
+    if not streamable_ssp(ssp_content):
+        logger.error("STREAM: The base SSP's root element does not declare OSCAL as its default namespace")
+        return status
+    splice = re.search(r"\n?([ \t]*)</(?:[\w.-]+:)?control-implementation\s*>", ssp_content)
+    if splice is None:
+        logger.error("STREAM: Unable to find the end of control-implementation in the base SSP")
+        return status
+
+    level = splice.group(1) + TAB
+    position = splice.start()
+    if components is not None:
+        components_splice = _components_splice(ssp_content[:position])
+        if components_splice is None:
+            logger.error("STREAM: Unable to find the system-implementation in the base SSP")
+            return status
+        (position, components_level) = components_splice
+
+    # Written as text inside the base SSP's default namespace, so built without one
+    backend = get_backend(backend if get_backend(backend).mutable else "stdlib")
+    builder = RequirementBuilder(backend.element("control-implementation"), components=components)
+    with metrics.phase("stream"):
+        try:
+            with open(output_file, mode='wb') as file:
+                file = ByteCounter(file)
+                file.write(ssp_content[:position].encode("utf-8"))
+                if components is not None:
+                    for index in range(components.count):
+                        _write_element(file, backend, builder.component(index), components_level)
+                    file.write(ssp_content[position:splice.start()].encode("utf-8"))
+                for control, uuid_cntr in select_controls(iter_catalog_controls(catalog_source)):
+                    metrics.count("controls_processed")
+                    with metrics.phase("build"):
+                        implemented_requirement = builder.implemented_requirement(control, uuid_cntr)
+                    _write_element(file, backend, implemented_requirement, level)
                     status = True
-            else:
-                logger.debug("Skipping  " + control_id)
-            # ssp_control_output += process_response_points(catalog_obj, xpath_expression + "[@id='" + control_id + "']" + rp_expansion, uuid_cntr)
+                file.write(ssp_content[splice.start():].encode("utf-8"))
+                metrics.count("bytes_written", file.bytes_written)
+        except (Exception, BaseException) as error:
+            logger.error("Error streaming to " + output_file + " (" + type(error).__name__ + ") " + str(error))
+            status = False
 
-            limit_cntr += 1
-            if limit_cntr > limit: break
+    return status
 
-    else:
-        logger.debug("TYPE: " + str(type(controls)))
+
+def streamable_ssp(ssp_content):
+    """
+    Returns True if the base SSP's root element declares OSCAL as its default
+    namespace. The streaming mode writes the generated elements as text without
+    a prefix, so a base SSP that uses a prefix for OSCAL (<o:system-security-plan
+    xmlns:o="...">) must be generated in memory instead. Only the start of the
+    content is parsed.
+    """
+    namespaces = {}
+    parser = ElementTree.XMLPullParser(events=("start-ns", "start"))
+    try:
+        for offset in range(0, len(ssp_content), 4096):
+            parser.feed(ssp_content[offset:offset + 4096])
+            for event, value in parser.read_events():
+                if event == "start-ns":
+                    namespaces[value[0]] = value[1]
+                else:
+                    return namespaces.get("") == OSCAL_DEFAULT_NAMESPACE
+    except ElementTree.ParseError as error:
+        logger.error("STREAM: Unable to parse the base SSP (" + str(error) + ")")
+    return False
+
+
+def _write_element(file, backend, element, level):
+    file.write(("\n" + level + backend.to_string(element, TAB).replace("\n", "\n" + level)).encode("utf-8"))
+
+
+def _components_splice(ssp_content):
+    # Returns (position, indentation) for new components: after the last component
+    # in system-implementation, else before its first inventory-item or its end (None if it has none)
+    start = re.search(r"<(?:[\w.-]+:)?system-implementation[\s>]", ssp_content)
+    end = re.search(r"\n?([ \t]*)</(?:[\w.-]+:)?system-implementation\s*>", ssp_content)
+    if start is None or end is None or end.start() < start.end():
+        return None
+    region = ssp_content[start.end():end.start()]
+    last = None
+    for last in re.finditer(r"^([ \t]*).*</(?:[\w.-]+:)?component\s*>", region, re.MULTILINE):
+        pass
+    if last is not None:
+        return (start.end() + last.end(), last.group(1))
+    inventory = re.search(r"\n([ \t]*)<(?:[\w.-]+:)?inventory-item[\s>]", region)
+    if inventory is not None:
+        return (start.end() + inventory.start(), inventory.group(1))
+    return (end.start(), end.group(1) + TAB)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# JSON AND YAML OUTPUT
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+OUTPUT_FORMATS = {".json": "json", ".yaml": "yaml", ".yml": "yaml"}
+_SPLICE_MARKER = "__implemented_requirements__"
+
+def output_format_of(file_name):
+    """
+    Returns the OSCAL format for an output file name: "json" or "yaml" by
+    extension, otherwise "xml".
+    """
+    return OUTPUT_FORMATS.get(os.path.splitext(str(file_name))[1].lower(), "xml")
+
+
+def requirement_object(control, uuid_cntr, component_uuid=this_system_uuid, description=this_system_description, components=None):
+    """
+    Returns the OSCAL JSON/YAML object for a control's implemented-requirement,
+    with the same content and UUIDs as RequirementBuilder.implemented_requirement.
+    """
+    ret_value = {"uuid": uuid_format(uuid_cntr), "control-id": control.id}
+    if control.params:
+        ret_value["set-parameters"] = [{"param-id": param_id, "values": ["placeholder"]} for param_id in control.params]
+    if control.response_points:
+        statements = []
+        statement_uuid = uuid_cntr
+        for rp in control.response_points:
+            by_components = [{"component-uuid": component_uuid, "uuid": uuid_format(statement_uuid + uuid_component_incr),
+                              "description": description}]
+            if components is not None:
+                by_components.extend([{"component-uuid": generated_uuid, "uuid": by_component_uuid,
+                                       "description": generated_by_component_description,
+                                       "implementation-status": {"state": "operational"}}
+                                      for (generated_uuid, by_component_uuid) in components.assign()])
+            statements.append({"statement-id": rp, "uuid": uuid_format(statement_uuid), "by-components": by_components})
+            statement_uuid += uuid_statement_incr
+        ret_value["statements"] = statements
+    metrics.count("objects_created", 1 + len(control.params) + 2 * len(control.response_points)
+                  + (components.per_statement * len(control.response_points) if components is not None else 0))
+    return ret_value
+
+
+def component_object(components, index):
+    """
+    Returns the OSCAL JSON/YAML system-implementation component for a generated
+    component, with the same content as RequirementBuilder.component.
+    """
+    return {"uuid": components.uuids[index], "type": components.type(index), "title": components.title(index),
+            "description": generated_component_description, "status": {"state": "operational"}}
+
+
+def read_document(file_name):
+    """
+    Reads an OSCAL JSON or YAML file (YAML requires PyYAML).
+
+    Returns:
+    - dict or None if the file could not be read
+    """
+    ret_value = None
+    content = normalize_content(get_file(file_name))
+    try:
+        if content.lstrip().startswith("{"):
+            ret_value = json.loads(content)
+        else:
+            ret_value = lazy_import("yaml").safe_load(content)
+    except (Exception, BaseException) as error:
+        logger.error("Unable to read " + str(file_name) + " as OSCAL JSON or YAML (" + type(error).__name__ + ") " + str(error))
+
+    return ret_value if isinstance(ret_value, dict) else None
+
+
+def stream_document(selected_controls, base_ssp, output_file, output_format="json", components=None):
+    """
+    JSON and YAML generation mode. The implemented-requirements are created as
+    plain objects straight from the catalog controls and written to the output
+    file one at a time, spliced into the base SSP's
+    control-implementation/implemented-requirements array after any existing
+    entries. No XML tree is built and the generated array is never held in
+    memory as a whole.
+
+    Parameters:
+    - selected_controls (iterable): (ControlEntry, uuid suffix) pairs, as yielded by select_controls
+    - base_ssp (dict or str): The base SSP as OSCAL JSON/YAML content (dict) or file name
+    - output_file (str): The file to create
+    - output_format (str)[optional]: "json" or "yaml" (YAML requires PyYAML)
+    - components (GeneratedComponents)[optional]: Components to add (scale-factor mode). Their
+      system-implementation entries are added to the base SSP's components in memory.
+
+    Returns:
+    - True if the output file was written. False if it could not be, or if there
+      would be no implemented-requirements (OSCAL requires at least one); then no file is created.
+    """
+    logger.debug("Streaming Controls as {} ...", output_format)
+    status = False
+    document = base_ssp if isinstance(base_ssp, dict) else read_document(base_ssp)
+    try:
+        control_implementation = document["system-security-plan"]["control-implementation"]
+    except (KeyError, TypeError):
+        logger.error("STREAM: The base SSP is not an OSCAL JSON/YAML SSP with a control-implementation")
+        return status
+
+    # Shallow copies down to control-implementation, so the caller's document is not changed
+    existing = list(control_implementation.get("implemented-requirements", []))
+    document = dict(document)
+    document["system-security-plan"] = dict(document["system-security-plan"], **{
+        "control-implementation": dict(control_implementation, **{"implemented-requirements": _SPLICE_MARKER})})
+    if components is not None:
+        system_implementation = document["system-security-plan"].get("system-implementation")
+        if not isinstance(system_implementation, dict):
+            logger.error("STREAM: The base SSP has no system-implementation for the generated components")
+            return status
+        document["system-security-plan"]["system-implementation"] = dict(system_implementation, **{
+            "components": list(system_implementation.get("components", [])) + [component_object(components, index) for index in range(components.count)]})
+
+    requirements = _requirement_objects(existing, selected_controls, components)
+    first = next(requirements, None)
+    if first is None:
+        logger.error("Problem inserting controls. No file created.")
+        return status
+    requirements = itertools.chain([first], requirements)
+
+    with metrics.phase("stream"):
+        try:
+            if output_format == "yaml":
+                yaml = lazy_import("yaml")
+                text = yaml.safe_dump(document, sort_keys=False, allow_unicode=True, default_flow_style=False)
+                marker = _SPLICE_MARKER
+            else:
+                text = json.dumps(document, indent=2, ensure_ascii=False)
+                marker = json.dumps(_SPLICE_MARKER)
+            position = text.index(marker)
+            level = re.match(r"[ ]*", text[text.rindex("\n", 0, position) + 1:]).group(0)
+
+            with open(output_file, mode='wb') as file:
+                file = ByteCounter(file)
+                if output_format == "yaml":
+                    file.write(text[:position].rstrip(" ").encode("utf-8"))
+                    for item in requirements:
+                        block = yaml.safe_dump([item], sort_keys=False, allow_unicode=True, default_flow_style=False).rstrip("\n")
+                        file.write(("\n" + level + block.replace("\n", "\n" + level)).encode("utf-8"))
+                else:
+                    item_level = level + "  "
+                    items = 0
+                    file.write((text[:position] + "[").encode("utf-8"))
+                    for item in requirements:
+                        file.write((("," if items else "") + "\n" + item_level
+                                    + json.dumps(item, indent=2, ensure_ascii=False).replace("\n", "\n" + item_level)).encode("utf-8"))
+                        items += 1
+                    file.write(("\n" + level + "]").encode("utf-8"))
+                file.write(text[position + len(marker):].encode("utf-8"))
+                metrics.count("bytes_written", file.bytes_written)
+            status = True
+        except (Exception, BaseException) as error:
+            logger.error("Error streaming to " + output_file + " (" + type(error).__name__ + ") " + str(error))
 
     return status
 
+
+def _requirement_objects(existing, selected_controls, components=None):
+    for item in existing:
+        yield item
+    for control, uuid_cntr in selected_controls:
+        metrics.count("controls_processed")
+        yield requirement_object(control, uuid_cntr, components=components)
+
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
 catalog_url = "https://raw.githubusercontent.com/GSA/fedramp-automation/refs/heads/develop/dist/content/rev5/baselines/xml/FedRAMP_rev5_HIGH-baseline-resolved-profile_catalog.xml"
 ssp_base_file = "./fedramp-ssp-example_base.oscal.xml"
 ssp_complete_file = "./fedramp-ssp-example.oscal.xml"
-ssp_control_output = ""
+cache_dir = "./cache"
+
+# The FedRAMP Rev 5 baselines (resolved profile catalogs and profiles) and the NIST catalog the profiles import,
+# fetched concurrently by --prefetch
+fedramp_baselines_url = "https://raw.githubusercontent.com/GSA/fedramp-automation/refs/heads/develop/dist/content/rev5/baselines/xml/"
+fedramp_baseline_urls = [fedramp_baselines_url + "FedRAMP_rev5_" + baseline + suffix
+                         for baseline in ["LOW", "MODERATE", "HIGH", "LI-SaaS"]
+                         for suffix in ["-baseline-resolved-profile_catalog.xml", "-baseline_profile.xml"]] \
+                        + ["https://raw.githubusercontent.com/usnistgov/oscal-content/main/nist.gov/SP800-53/rev5/xml/NIST_SP-800-53_rev5_catalog.xml"]
+schema_dir = "./schemas"
+
+
+def load_catalog(catalog_source, catalog_cache=None, catalog_snapshots=None, backend="stdlib", catalog_content=None):
+    """
+    Loads a catalog from a URL or a local file and returns its CatalogIndex,
+    using the snapshot for the catalog content when there is one.
+    catalog_content is the already fetched content of a catalog URL (see fetch_files).
+
+    Returns:
+    - CatalogIndex or None if the catalog could not be loaded
+    """
+    ret_value = None
+    if catalog_content is not None:
+        pass
+    elif is_url(catalog_source):
+        catalog_content = fetch_file(catalog_source, catalog_cache)
+    else:
+        catalog_content = normalize_content(get_file(catalog_source))
+
+    if catalog_content:
+        if catalog_snapshots is not None:
+            ret_value = catalog_snapshots.load(catalog_content)
+        if ret_value is None:
+            catalog_obj = oscal(catalog_content, backend=backend)
+            if catalog_obj.valid_oscal:
+                ret_value = CatalogIndex.from_oscal(catalog_obj)
+                if catalog_snapshots is not None:
+                    catalog_snapshots.save(catalog_content, ret_value)
+
+    return ret_value
+
+
+def open_catalog(catalog, catalog_cache=None):
+    """
+    Returns the source the streaming modes read a catalog from: a catalog
+    file name as is, or for a URL a binary file object with its content
+    (downloaded to the cache or a temporary file, never held in memory).
+    Close it with close_catalog.
+
+    Returns:
+    - str, file object, or None if the URL could not be fetched
+    """
+    return fetch_stream(catalog, catalog_cache) if is_url(catalog) else catalog
+
+
+def close_catalog(catalog_source):
+    if catalog_source is not None and not isinstance(catalog_source, str):
+        catalog_source.close()
+
+
+def load_catalog_index(catalog, catalog_cache=None, catalog_snapshots=None, backend="stdlib"):
+    """
+    Returns the CatalogIndex for a CatalogIndex, a catalog oscal object, or a
+    catalog URL or file name (None if it could not be loaded).
+    """
+    if isinstance(catalog, CatalogIndex):
+        return catalog
+    elif isinstance(catalog, oscal):
+        return CatalogIndex.from_oscal(catalog) if catalog.valid_oscal else None
+    return load_catalog(catalog, catalog_cache, catalog_snapshots, backend)
+
+
+def generate_ssp(catalog, base_ssp, output=None, stream=False, catalog_cache=None, catalog_snapshots=None, backend="stdlib", incremental=False,
+                 output_format=None, schemas=None, components=0, components_per_statement=1):
+    """
+    Generates implemented-requirement content in a base SSP for the controls
+    in a catalog. This is the library entry point; nothing is configured or
+    fetched until it is called.
+
+    Parameters:
+    - catalog: A CatalogIndex, a catalog oscal object, or a catalog URL or file name
+    - base_ssp: A base SSP oscal object or file name. An oscal object is modified in place.
+    - output (str)[optional]: The file to write the generated SSP to. Required when streaming.
+    - stream (bool)[optional]: Use the streaming mode (catalog URL or file name and
+      base SSP file name only). Nothing is held in memory; the result is written to output.
+      A base SSP without OSCAL as its default namespace is generated in memory instead.
+    - catalog_cache (FetchCache)[optional]: Cache used when the catalog is a URL
+    - catalog_snapshots (CatalogSnapshots)[optional]: Snapshots used when the catalog is loaded
+    - backend (str)[optional]: The XML backend used for documents loaded from files ("stdlib", "lxml" or "saxon").
+      The saxon backend is read-only, so with it the base SSP is loaded with stdlib.
+    - incremental (bool)[optional]: Only add the implemented-requirements, set-parameters and
+      statements missing from base_ssp (for example a previously generated SSP); existing content is kept.
+    - output_format (str)[optional]: "xml", "json" or "yaml" (default: from the output file extension).
+      JSON and YAML are written directly from the catalog, without an XML tree, and need an
+      OSCAL JSON or YAML base SSP (file name or dict) and an output file.
+    - schemas (SchemaCache)[optional]: Validate the generated SSP against the OSCAL XML schema.
+      An invalid SSP is still written, but None is returned. JSON and YAML output is not validated.
+    - components (int)[optional]: Scale-factor mode (load testing): the number of components to generate.
+      Each gets a system-implementation component, and each statement gets components_per_statement
+      by-components for them in turn. Not incremental.
+    - components_per_statement (int)[optional]: The number of generated by-components in each statement
+
+    Returns:
+    - The generated SSP oscal object (streaming, JSON and YAML: True), or None on failure
+    """
+    generated_components = None
+    if components > 0:
+        if incremental:
+            logger.error("The scale-factor (components) and incremental modes cannot be combined")
+            return None
+        generated_components = GeneratedComponents(components, components_per_statement)
+    ret_value = _generate_ssp(catalog, base_ssp, output, stream, catalog_cache, catalog_snapshots, backend, incremental, output_format,
+                              generated_components)
+    if ret_value is not None and schemas is not None:
+        if isinstance(ret_value, oscal):
+            valid = ret_value.OSCAL_validate(schemas)
+        elif (output_format or output_format_of(output)) == "xml":
+            result = schemas.validate_file(output)
+            valid = result["valid"]
+            if not valid:
+                logger.error("NOT VALID " + output + ": " + "; ".join(result["errors"][:3]))
+        else:
+            valid = True
+            logger.warning("Schema validation is only available for XML; " + output + " was not validated")
+        if not valid:
+            ret_value = None
+
+    return ret_value
+
+
+def _generate_ssp(catalog, base_ssp, output, stream, catalog_cache, catalog_snapshots, backend, incremental, output_format, components):
+    ret_value = None
+    ssp_content = None
+    output_format = output_format or (output_format_of(output) if output is not None else "xml")
+    if output_format in ["json", "yaml"]:
+        if incremental or output is None or not isinstance(base_ssp, (str, dict)):
+            logger.error(output_format.upper() + " output requires an OSCAL JSON or YAML base SSP and an output file, and is not incremental")
+            return ret_value
+        catalog_source = None
+        if stream and isinstance(catalog, str):
+            catalog_source = open_catalog(catalog, catalog_cache)
+            controls = iter_catalog_controls(catalog_source) if catalog_source is not None else None
+        else:
+            controls = load_catalog_index(catalog, catalog_cache, catalog_snapshots, backend)
+        try:
+            if controls is None:
+                logger.error("problem loading catalog.")
+            elif stream_document(select_controls(controls), base_ssp, output, output_format, components):
+                ret_value = True
+        finally:
+            close_catalog(catalog_source)
+        return ret_value
 
-catalog_content = fetch_file(catalog_url)
-catalog_obj = oscal(catalog_content)
-ssp_content = normalize_content(get_file(ssp_base_file))
-ssp_obj = oscal(ssp_content)
+    if stream:
+        if incremental:
+            logger.error("The streaming and incremental modes cannot be combined")
+            return ret_value
+        if output is None or not isinstance(catalog, str) or not isinstance(base_ssp, str):
+            logger.error("Streaming requires a catalog URL or file name, a base SSP file name and an output file")
+            return ret_value
+        ssp_content = normalize_content(get_file(base_ssp))
+        if streamable_ssp(ssp_content):
+            catalog_source = open_catalog(catalog, catalog_cache)
+            try:
+                if catalog_source is None:
+                    logger.error("problem loading catalog.")
+                elif stream_controls(catalog_source, ssp_content, output, components, backend):
+                    ret_value = True
+                else:
+                    logger.error("Problem streaming controls. Output file is incomplete.")
+            finally:
+                close_catalog(catalog_source)
+            return ret_value
+        logger.warning("STREAM: The base SSP does not use OSCAL as its default namespace. Generating in memory instead.")
+
+    catalog_index = load_catalog_index(catalog, catalog_cache, catalog_snapshots, backend)
+    if catalog_index is None:
+        logger.error("problem loading catalog.")
+        return ret_value
 
-if catalog_obj.valid_oscal:
+    ssp_backend = backend if get_backend(backend).mutable else "stdlib"
+    if isinstance(base_ssp, oscal):
+        ssp_obj = base_ssp
+    else:
+        ssp_obj = oscal(ssp_content if ssp_content is not None else normalize_content(get_file(base_ssp)), backend=ssp_backend)
     if ssp_obj.valid_oscal:
-        if insert_controls(catalog_obj, ssp_obj):
-            output = ssp_obj.serializer()
-            logger.debug(str(type(output)))
-            putfile(ssp_complete_file, output)
+        if update_controls(catalog_index, ssp_obj) if incremental else insert_controls(catalog_index, ssp_obj, components):
+            if output is None or ssp_obj.serialize_to(output) > 0:
+                ret_value = ssp_obj
         else: 
             logger.error("Problem inserting controls. No file created.")
     else:
         logger.error("Problem loading base SSP")
-else:
-    logger.error("problem loading catalog.")
 
+    return ret_value
+
+
+def generate_ssp_file(catalog_index, base_ssp_file, output_file, backend="stdlib", schemas=None):
+    """
+    Generates one SSP file from a loaded catalog index and a base SSP file.
+    With schemas, the SSP is also validated (see generate_ssp).
+
+    Returns:
+    - The number of bytes written (0 if no file was created or it is not valid)
+    """
+    ret_value = 0
+    if generate_ssp(catalog_index, base_ssp_file, output_file, backend=backend, schemas=schemas) is not None:
+        ret_value = os.path.getsize(output_file)
+
+    return ret_value
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# BATCH GENERATION
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+# Catalog indexes shared by the jobs run in a batch worker process
+_batch_catalogs = {}
+# The schema cache of a batch worker process (None: no validation)
+_batch_schemas = None
+
+def read_manifest(manifest_file):
+    """
+    Reads a batch manifest. The manifest is a JSON file containing either a
+    list of jobs or an object with a "jobs" list. Each job is an object with
+    "catalog" (URL or file), "base_ssp" (file) and "output" (file).
+    Relative file names are resolved against the manifest's directory.
+
+    Returns:
+    - list of job dicts (empty if the manifest could not be read)
+    """
+    ret_value = []
+    try:
+        with open(manifest_file, mode='r', encoding='utf-8') as file:
+            manifest = json.load(file)
+        jobs = manifest.get("jobs", []) if isinstance(manifest, dict) else manifest
+        base_dir = os.path.dirname(os.path.abspath(manifest_file))
+        for job in jobs:
+            job = dict(job)
+            for key in ["catalog", "base_ssp", "output"]:
+                if not is_url(job[key]):
+                    job[key] = os.path.join(base_dir, job[key])
+            ret_value.append(job)
+    except (Exception, BaseException) as error:
+        logger.error("Unable to read manifest " + manifest_file + " (" + type(error).__name__ + ") " + str(error))
+
+    return ret_value
+
+
+def _init_batch_worker(catalogs, schema_settings=None):
+    global _batch_schemas
+    _batch_catalogs.update(catalogs)
+    if schema_settings is not None:
+        _batch_schemas = SchemaCache(*schema_settings)
+
+
+def _run_batch_job(job):
+    start = time.perf_counter()
+    bytes_written = 0
+    catalog_index = _batch_catalogs.get(job["catalog"])
+    if catalog_index is not None:
+        bytes_written = generate_ssp_file(catalog_index, job["base_ssp"], job["output"], job.get("backend", "stdlib"), _batch_schemas)
+    return {"catalog": job["catalog"], "base_ssp": job["base_ssp"], "output": job["output"],
+            "status": bytes_written > 0, "bytes": bytes_written,
+            "seconds": round(time.perf_counter() - start, 4)}
+
+
+def run_batch(jobs, workers=None, catalog_cache=None, catalog_snapshots=None, backend="stdlib", schemas=None):
+    """
+    Runs a list of generation jobs in a process pool.
+    Each distinct catalog is loaded once in this process and shared with the
+    workers when they start, so jobs using the same catalog never re-load it.
+    Catalog URLs are all fetched concurrently before the catalogs are loaded.
+
+    With schemas (a SchemaCache), every generated SSP is validated in its
+    worker; a job whose SSP is not valid fails. The schemas the base SSPs
+    need are compiled (or loaded) here first, so the workers load them from
+    the schema cache directory instead of compiling them again.
+
+    Returns:
+    - dict with the per-job results and a throughput summary
+    """
+    start = time.perf_counter()
+    fetched = fetch_files([job["catalog"] for job in jobs if is_url(job["catalog"])], catalog_cache)
+    catalogs = {}
+    for job in jobs:
+        if job["catalog"] not in catalogs:
+            catalogs[job["catalog"]] = load_catalog(job["catalog"], catalog_cache, catalog_snapshots, backend, fetched.get(job["catalog"]))
+            if catalogs[job["catalog"]] is None:
+                logger.error("Problem loading catalog " + job["catalog"])
+    catalogs = dict([(key, value) for (key, value) in catalogs.items() if value is not None])
+    load_seconds = time.perf_counter() - start
+
+    schema_settings = None
+    if schemas is not None:
+        for (model, oscal_version) in set([document_info(job["base_ssp"]) for job in jobs]):
+            if model in OSCAL_MODELS and oscal_version:
+                schemas.get(model, oscal_version)
+        schema_settings = (schemas.schema_dir, schemas.cache_dir, schemas.engine, schemas.max_errors)
+
+    jobs = [dict(job, backend=job.get("backend", backend)) for job in jobs]
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                                                initargs=(catalogs, schema_settings)) as pool:
+        for result in pool.map(_run_batch_job, jobs):
+            logger.info(("OK    " if result["status"] else "FAILED") + " " + result["output"] + " (" + str(result["seconds"]) + "s)")
+            results.append(result)
+
+    seconds = time.perf_counter() - start
+    succeeded = len([result for result in results if result["status"]])
+    summary = {"jobs": len(results), "succeeded": succeeded, "failed": len(results) - succeeded,
+               "catalogs": len(catalogs), "catalog_load_seconds": round(load_seconds, 4),
+               "seconds": round(seconds, 4),
+               "jobs_per_second": round(len(results) / seconds, 2) if seconds > 0 else 0,
+               "bytes_written": sum([result["bytes"] for result in results])}
+    logger.info("BATCH SUMMARY: " + json.dumps(summary))
+
+    return {"results": results, "summary": summary}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generates OSCAL SSP content from a FedRAMP baseline catalog.")
+    parser.add_argument("--catalog", default=catalog_url, help="Catalog URL or file (default: the FedRAMP HIGH baseline)")
+    parser.add_argument("--base-ssp", default=ssp_base_file, help="Base SSP file (default: %(default)s)")
+    parser.add_argument("--output", default=ssp_complete_file, help="Generated SSP file (default: %(default)s)")
+    parser.add_argument("--stream", action="store_true", help="Streaming mode: bounded memory, no in-memory catalog or SSP tree")
+    parser.add_argument("--backend", choices=["stdlib", "lxml", "saxon"], default="stdlib", help="XML backend (default: %(default)s)")
+    parser.add_argument("--format", choices=["xml", "json", "yaml"], default=None,
+                        help="Output format (default: from the --output extension; JSON and YAML need a JSON or YAML --base-ssp)")
+    parser.add_argument("--incremental", action="store_true", help="Only add what is missing from the base SSP (e.g. a previously generated SSP)")
+    parser.add_argument("--offline", action="store_true", help="Only use cached copies of remote catalogs")
+    parser.add_argument("--components", type=int, default=0,
+                        help="Scale-factor mode for load-test SSPs: generate this many components, referenced from every statement")
+    parser.add_argument("--components-per-statement", type=int, default=1,
+                        help="Generated by-components in each statement with --components (default: %(default)s)")
+    parser.add_argument("--all-controls", action="store_true", help="Generate every catalog control (no control limit or skipped controls)")
+    parser.add_argument("--prefetch", metavar="URL", nargs="*", default=None,
+                        help="Fetch URLs (default: all FedRAMP baselines and their profile sources) into the cache concurrently and exit")
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds to wait for a server to connect or send data (default: %(default)s)")
+    parser.add_argument("--retries", type=int, default=3, help="Retries of a failed fetch, with exponential backoff (default: %(default)s)")
+    parser.add_argument("--fetch-workers", type=int, default=8, help="Maximum concurrent fetches (default: %(default)s)")
+    parser.add_argument("--metrics", metavar="FILE", help="Write per-phase timing, memory and counters as JSON to FILE")
+    parser.add_argument("--trace-memory", action="store_true", help="Trace Python memory allocations for per-phase peak memory (slower)")
+    parser.add_argument("--batch", metavar="MANIFEST", help="JSON manifest of (catalog, base_ssp, output) jobs to run in a process pool")
+    parser.add_argument("--workers", type=int, default=None, help="Number of batch or validation worker processes (default: CPU count)")
+    parser.add_argument("--report", metavar="FILE", help="Write the batch or validation results and summary as JSON to FILE")
+    parser.add_argument("--validate", action="store_true", help="Validate the generated SSP against the OSCAL XML schema (exit 1 if invalid)")
+    parser.add_argument("--validate-files", metavar="FILE", nargs="+", help="Validate OSCAL XML files in a process pool instead of generating")
+    parser.add_argument("--schema-dir", default=schema_dir, help="Directory of OSCAL XSD files by OSCAL version (default: %(default)s)")
+    parser.add_argument("--schema-engine", choices=["xmlschema", "lxml"], default=None,
+                        help="Schema validator (default: xmlschema if installed, otherwise lxml)")
+    parser.add_argument("--log-level", default=log_level, type=str.upper,
+                        choices=["TRACE", "DEBUG", "INFO", "SUCCESS", "WARNING", "DATABASE", "ERROR", "CRITICAL"],
+                        help="Minimum level logged to the console and log file (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    configure_logging(args.log_level, replace_default=True)
+    if args.all_controls:
+        global control_limit, skipped_controls
+        control_limit = None
+        skipped_controls = []
+    logger.debug("Start")
+    if args.metrics:
+        metrics.start(trace_memory=args.trace_memory)
+    catalog_cache = FetchCache(cache_dir, max_age=None, max_size=200 * 1024 * 1024, offline=args.offline)
+    default_fetcher.timeout = (min(10, args.timeout), args.timeout)
+    default_fetcher.retries = args.retries
+    default_fetcher.max_workers = args.fetch_workers
+    catalog_snapshots = CatalogSnapshots(os.path.join(cache_dir, "snapshots"))
+    schemas = None
+    if args.validate or args.validate_files:
+        schemas = SchemaCache(args.schema_dir, os.path.join(cache_dir, "schemas"), args.schema_engine)
+
+    if args.prefetch is not None:
+        fetched = fetch_files(args.prefetch or fedramp_baseline_urls, catalog_cache)
+        for (url, content) in fetched.items():
+            logger.info(("OK    " if content else "FAILED") + " " + url + " (" + str(len(content)) + " characters)")
+        return 0 if all(fetched.values()) else 1
+
+    if args.validate_files:
+        report = validate_files(args.validate_files, schemas, args.workers)
+        print(json.dumps(report["summary"], indent=2))
+        if args.report:
+            putfile(args.report, json.dumps(report, indent=2))
+        return 0 if report["summary"]["invalid"] == 0 else 1
+
+    if args.batch:
+        jobs = read_manifest(args.batch)
+        if not jobs:
+            logger.error("No jobs in manifest " + args.batch)
+            return 1
+        report = run_batch(jobs, args.workers, catalog_cache, catalog_snapshots, args.backend, schemas)
+        print(json.dumps(report["summary"], indent=2))
+        if args.report:
+            putfile(args.report, json.dumps(report, indent=2))
+        return 0 if report["summary"]["failed"] == 0 else 1
+
+    status = generate_ssp(args.catalog, args.base_ssp, args.output, stream=args.stream,
+                          catalog_cache=catalog_cache, catalog_snapshots=catalog_snapshots, backend=args.backend,
+                          incremental=args.incremental, output_format=args.format, schemas=schemas,
+                          components=args.components, components_per_statement=args.components_per_statement) is not None
+
+    logger.debug("XPath cache: {}", xpath_cache.stats())
+    if args.metrics:
+        metrics.stop()
+        metrics.write_report(args.metrics)
+    return 0 if status else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
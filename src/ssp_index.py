@@ -0,0 +1,130 @@
+from loguru import logger
+from common import *
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# IMPLEMENTATION INDEX
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+class RequirementEntry:
+    """
+Requirement Entry Class
+
+The existing content of one implemented-requirement in an SSP.
+
+Properties:
+- element: The implemented-requirement element
+- set_parameters: A dict of set-parameter elements keyed by param-id
+- statements: A dict of statement elements keyed by statement-id
+    """
+    __slots__ = ("element", "set_parameters", "statements")
+
+    def __init__(self, element):
+        self.element = element
+        self.set_parameters = {}
+        self.statements = {}
+
+
+class ImplementationIndex:
+    """
+Implementation Index Class
+
+Indexes the implemented-requirement, set-parameter and statement entries of
+an SSP's control-implementation with a single pass over its children, so
+each control can be checked against the catalog with dict lookups.
+The index is kept current by add(), add_set_parameter() and add_statement().
+
+Properties:
+- control_implementation: The control-implementation element (None if the SSP has none)
+- requirements: A dict of RequirementEntry objects keyed by control-id
+    """
+    def __init__(self, ssp_obj):
+        self.control_implementation = None
+        self.requirements = {}
+
+        if ssp_obj.tree is not None and ssp_obj.backend.mutable:
+            self.control_implementation = ssp_obj.tree.find("control-implementation", namespaces=ssp_obj.nsmap)
+        if self.control_implementation is not None:
+            for child in self.control_implementation:
+                if local_name(child) == "implemented-requirement":
+                    self.add(child)
+            logger.debug("IMPLEMENTATION INDEX: {} implemented requirements", len(self.requirements))
+
+    def add(self, implemented_requirement):
+        entry = RequirementEntry(implemented_requirement)
+        for child in implemented_requirement:
+            name = local_name(child)
+            if name == "set-parameter":
+                entry.set_parameters[child.get("param-id")] = child
+            elif name == "statement":
+                entry.statements[child.get("statement-id")] = child
+        self.requirements[implemented_requirement.get("control-id")] = entry
+        return entry
+
+    def add_set_parameter(self, control_id, set_parameter):
+        self.requirements[control_id].set_parameters[set_parameter.get("param-id")] = set_parameter
+
+    def add_statement(self, control_id, statement):
+        self.requirements[control_id].statements[statement.get("statement-id")] = statement
+
+    def get(self, control_id):
+        return self.requirements.get(control_id)
+
+    def __contains__(self, control_id):
+        return control_id in self.requirements
+
+    def __len__(self):
+        return len(self.requirements)
+
+
+def local_name(element):
+    """
+    Returns an element's name without its namespace ("" for comments and
+    processing instructions).
+    """
+    tag = element.tag
+    return tag.rpartition("}")[2] if isinstance(tag, str) else ""
+
+
+def insert_child(parent, child, before_names):
+    """
+    Inserts child before the first child of parent named in before_names,
+    or appends it, so new content keeps the OSCAL model's element order.
+    """
+    for index, sibling in enumerate(parent):
+        if local_name(sibling) in before_names:
+            parent.insert(index, child)
+            return
+    parent.append(child)
+
+
+def insert_after(parent, child, sibling):
+    """
+    Inserts child right after sibling, a child of parent.
+    """
+    for index, element in enumerate(parent):
+        if element is sibling:
+            parent.insert(index + 1, child)
+            return
+    parent.append(child)
+
+
+def insert_before(parent, child, sibling):
+    """
+    Inserts child right before sibling, a child of parent.
+    """
+    for index, element in enumerate(parent):
+        if element is sibling:
+            parent.insert(index, child)
+            return
+    parent.append(child)
+
+
+def insert_children(parent, children, before_names):
+    """
+    Inserts a list of children before the first child of parent named in
+    before_names (or appends them) with a single slice assignment.
+    """
+    for index, sibling in enumerate(parent):
+        if local_name(sibling) in before_names:
+            parent[index:index] = children
+            return
+    parent.extend(children)
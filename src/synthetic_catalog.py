@@ -0,0 +1,171 @@
+from common import *
+import argparse
+import io
+import json
+import sys
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+# SYNTHETIC CATALOG
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def write_synthetic_catalog(destination, controls=100, enhancements=0, params=2, response_points=3, controls_per_group=20, catalog_format="xml"):
+    """
+    Writes an OSCAL catalog with the shape of a FedRAMP resolved profile
+    catalog: groups of controls, each with params and a statement whose item
+    parts carry the FedRAMP response-point property. The catalog is written
+    one control at a time, so any size can be generated in constant memory.
+    The content is deterministic for a given set of arguments.
+
+    Parameters:
+    - destination (str or obj): A file name or a text stream
+    - controls (int)[optional]: The number of base controls
+    - enhancements (int)[optional]: The number of enhancements in each base control
+    - params (int)[optional]: The number of params in each control and enhancement
+    - response_points (int)[optional]: The number of response-point statement items in each control and enhancement
+    - controls_per_group (int)[optional]: The number of base controls in each group
+    - catalog_format (str)[optional]: "xml" or "json" (the same catalog in OSCAL JSON)
+
+    Returns:
+    - The total number of controls written (base controls and enhancements)
+    """
+    if isinstance(destination, str):
+        with open(destination, mode='w', encoding='utf-8') as file:
+            return write_synthetic_catalog(file, controls, enhancements, params, response_points, controls_per_group, catalog_format)
+    if catalog_format == "json":
+        return _write_json_catalog(destination, controls, enhancements, params, response_points, controls_per_group)
+
+    ret_value = 0
+    destination.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                      '<catalog xmlns="' + OSCAL_DEFAULT_NAMESPACE + '" uuid="' + uuid_format(0) + '">\n'
+                      + TAB + '<metadata>\n'
+                      + indent(2) + '<title>Synthetic Catalog (' + str(controls) + ' controls)</title>\n'
+                      + indent(2) + '<last-modified>2024-01-01T00:00:00Z</last-modified>\n'
+                      + indent(2) + '<version>1.0</version>\n'
+                      + indent(2) + '<oscal-version>1.1.2</oscal-version>\n'
+                      + TAB + '</metadata>\n')
+    for control in range(controls):
+        group = control // controls_per_group
+        if control % controls_per_group == 0:
+            if control > 0:
+                destination.write(TAB + '</group>\n')
+            destination.write(TAB + '<group id="g' + str(group + 1) + '" class="family">\n'
+                              + indent(2) + '<title>Group ' + str(group + 1) + '</title>\n')
+        control_id = "g" + str(group + 1) + "-" + str(control % controls_per_group + 1)
+        destination.write(_control(control_id, 2, params, response_points, False))
+        for enhancement in range(enhancements):
+            destination.write(_control(control_id + "." + str(enhancement + 1), 3, params, response_points, True))
+        destination.write(indent(2) + '</control>\n')
+        ret_value += 1 + enhancements
+    if controls > 0:
+        destination.write(TAB + '</group>\n')
+    destination.write('</catalog>\n')
+
+    return ret_value
+
+
+def _control(control_id, level, params, response_points, close):
+    out = [indent(level) + '<control id="' + control_id + '" class="SP800-53">\n',
+           indent(level + 1) + '<title>Control ' + control_id + '</title>\n']
+    for param in range(params):
+        out.append(indent(level + 1) + '<param id="' + control_id + '_prm_' + str(param + 1) + '">'
+                   '<label>organization-defined value ' + str(param + 1) + '</label></param>\n')
+    out.append(indent(level + 1) + '<prop name="label" value="' + control_id.upper() + '"/>\n')
+    out.append(indent(level + 1) + '<part id="' + control_id + '_smt" name="statement">\n')
+    for item in range(response_points):
+        letter = _item_letter(item)
+        out.append(indent(level + 2) + '<part id="' + control_id + '_smt.' + letter + '" name="item">'
+                   '<prop name="label" value="' + letter + '."/>'
+                   '<prop name="response-point" ns="' + FEDRAMP_NAMESPACE + '" value="' + control_id + '_smt.' + letter + '"/>'
+                   '<p>Statement item ' + letter + '.</p></part>\n')
+    out.append(indent(level + 1) + '</part>\n')
+    out.append(indent(level + 1) + '<part id="' + control_id + '_gdn" name="guidance"><p>Guidance.</p></part>\n')
+    if close:
+        out.append(indent(level) + '</control>\n')
+    return "".join(out)
+
+
+def _write_json_catalog(destination, controls, enhancements, params, response_points, controls_per_group):
+    ret_value = 0
+    metadata = {"title": "Synthetic Catalog (" + str(controls) + " controls)", "last-modified": "2024-01-01T00:00:00Z",
+                "version": "1.0", "oscal-version": "1.1.2"}
+    destination.write('{\n  "catalog": {\n    "uuid": "' + uuid_format(0) + '",\n    "metadata": ' + json.dumps(metadata) + ',\n    "groups": [')
+    for control in range(controls):
+        group = control // controls_per_group
+        if control % controls_per_group == 0:
+            if control > 0:
+                destination.write('\n      ]},')
+            destination.write('\n      {"id": "g' + str(group + 1) + '", "class": "family", "title": "Group ' + str(group + 1) + '", "controls": [')
+        control_id = "g" + str(group + 1) + "-" + str(control % controls_per_group + 1)
+        control_object = _control_object(control_id, params, response_points)
+        if enhancements:
+            control_object["controls"] = [_control_object(control_id + "." + str(enhancement + 1), params, response_points)
+                                          for enhancement in range(enhancements)]
+        destination.write(("," if control % controls_per_group else "") + '\n        ' + json.dumps(control_object))
+        ret_value += 1 + enhancements
+    if controls > 0:
+        destination.write('\n      ]}')
+    destination.write('\n    ]\n  }\n}\n')
+
+    return ret_value
+
+
+def _control_object(control_id, params, response_points):
+    items = []
+    for item in range(response_points):
+        letter = _item_letter(item)
+        items.append({"id": control_id + "_smt." + letter, "name": "item",
+                      "props": [{"name": "label", "value": letter + "."},
+                                {"name": "response-point", "ns": FEDRAMP_NAMESPACE, "value": control_id + "_smt." + letter}],
+                      "prose": "Statement item " + letter + "."})
+    ret_value = {"id": control_id, "class": "SP800-53", "title": "Control " + control_id}
+    if params:
+        ret_value["params"] = [{"id": control_id + "_prm_" + str(param + 1), "label": "organization-defined value " + str(param + 1)}
+                               for param in range(params)]
+    ret_value["props"] = [{"name": "label", "value": control_id.upper()}]
+    statement = {"id": control_id + "_smt", "name": "statement"}
+    if items:
+        statement["parts"] = items
+    ret_value["parts"] = [statement, {"id": control_id + "_gdn", "name": "guidance", "prose": "Guidance."}]
+    return ret_value
+
+
+def _item_letter(item):
+    # a..z, then aa, ab, ...
+    letters = ""
+    item += 1
+    while item > 0:
+        item, remainder = divmod(item - 1, 26)
+        letters = chr(ord("a") + remainder) + letters
+    return letters
+
+
+def synthetic_catalog(controls=100, enhancements=0, params=2, response_points=3, controls_per_group=20, catalog_format="xml"):
+    """
+    Returns the content of a synthetic catalog as a string.
+    See write_synthetic_catalog for the parameters.
+    """
+    out_stream = io.StringIO()
+    write_synthetic_catalog(out_stream, controls, enhancements, params, response_points, controls_per_group, catalog_format)
+    return out_stream.getvalue()
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Writes a synthetic OSCAL catalog for testing and benchmarks.")
+    parser.add_argument("output", help="Catalog file to create")
+    parser.add_argument("--controls", type=int, default=100, help="Base controls (default: %(default)s)")
+    parser.add_argument("--enhancements", type=int, default=0, help="Enhancements per base control (default: %(default)s)")
+    parser.add_argument("--params", type=int, default=2, help="Params per control (default: %(default)s)")
+    parser.add_argument("--response-points", type=int, default=3, help="Response points per control (default: %(default)s)")
+    parser.add_argument("--format", choices=["xml", "json"], default=None, help="Catalog format (default: from the output extension)")
+    args = parser.parse_args(argv)
+
+    catalog_format = args.format or ("json" if args.output.lower().endswith(".json") else "xml")
+    total = write_synthetic_catalog(args.output, args.controls, args.enhancements, args.params, args.response_points,
+                                    catalog_format=catalog_format)
+    print(str(total) + " controls written to " + args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
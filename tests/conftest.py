@@ -0,0 +1,107 @@
+import http.server
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+
+BASE_SSP = os.path.join(SRC_DIR, "fedramp-ssp-example_base.oscal.xml")
+
+
+class StandInServer:
+    """
+    A local HTTP/1.1 server standing in for the content servers. Each route is
+    a function route(request, count) returning (status, headers, body), where
+    count is the number of requests for the path so far (1 for the first).
+    Unknown paths get 404. Every request is recorded in requests as
+    (path, headers, client port).
+    """
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with server.lock:
+                    server.requests.append((self.path, dict(self.headers), self.client_address[1]))
+                    count = len([request for request in server.requests if request[0] == self.path])
+                    server.active += 1
+                    server.max_active = max(server.max_active, server.active)
+                try:
+                    route = server.routes.get(self.path)
+                    (status, headers, body) = route(self, count) if route is not None else (404, {}, b"")
+                    self.send_response(status)
+                    for (name, value) in headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with server.lock:
+                        server.active -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path):
+        return "http://127.0.0.1:" + str(self.httpd.server_port) + path
+
+    def hits(self, path):
+        return [request for request in self.requests if request[0] == path]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def static(body, etag=None, last_modified=None, delay=0):
+    """
+    Returns a route serving body, answering conditional requests with 304.
+    """
+    def route(request, count):
+        time.sleep(delay)
+        headers = {}
+        if etag:
+            headers["ETag"] = etag
+        if last_modified:
+            headers["Last-Modified"] = last_modified
+        if (etag and request.headers.get("If-None-Match") == etag) or \
+           (last_modified and not etag and request.headers.get("If-Modified-Since") == last_modified):
+            return (304, headers, b"")
+        return (200, headers, body)
+    return route
+
+
+@pytest.fixture
+def server():
+    stand_in = StandInServer()
+    yield stand_in
+    stand_in.close()
+
+
+@pytest.fixture
+def catalog_file(tmp_path):
+    """
+    A small synthetic catalog: 3 controls with 1 enhancement each, 2 params and 2 response points per control.
+    """
+    from synthetic_catalog import write_synthetic_catalog
+    file_name = str(tmp_path / "catalog.xml")
+    write_synthetic_catalog(file_name, controls=3, enhancements=1, params=2, response_points=2, controls_per_group=2)
+    return file_name
@@ -0,0 +1,51 @@
+import pytest
+
+from oscal_backends import xpath_number
+from ssp_content_creator import oscal
+
+SSP = """<?xml version="1.0" encoding="UTF-8"?>
+<system-security-plan xmlns="http://csrc.nist.gov/ns/oscal/1.0" uuid="11111111-2222-4000-8000-000000000000">
+  <metadata>
+    <title>Test SSP</title>
+    <oscal-version>1.1.2</oscal-version>
+  </metadata>
+  <control-implementation>
+    <implemented-requirement control-id="ac-1" uuid="11111111-2222-4000-8000-000000000001"/>
+    <implemented-requirement control-id="ac-2" uuid="11111111-2222-4000-8000-000000000002"/>
+    <implemented-requirement control-id="ac-3" uuid="11111111-2222-4000-8000-000000000003"/>
+  </control-implementation>
+</system-security-plan>
+"""
+
+BACKEND_MODULES = {"stdlib": "elementpath", "lxml": "lxml", "saxon": "saxonche"}
+
+
+@pytest.fixture(params=list(BACKEND_MODULES))
+def document(request):
+    pytest.importorskip(BACKEND_MODULES[request.param])
+    return oscal(SSP, backend=request.param)
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("count(//implemented-requirement)", "3"),
+    ("string-length('abcd')", "4"),
+    ("1 div 1", "1"),
+    ("3 div 2", "1.5"),
+    ("count(//implemented-requirement) * 1.0", "3"),
+    ("number('4')", "4"),
+    ("floor(2.5)", "2"),
+    ("string(/*/metadata/title)", "Test SSP"),
+])
+def test_atomic_values_agree_across_backends(document, expression, expected):
+    assert document.xpath_atomic(expression) == expected
+
+
+def test_relative_paths_start_at_the_root_element(document):
+    assert len(document.xpath("./metadata/title")) == 1
+    assert document.xpath_atomic("./@uuid") == "11111111-2222-4000-8000-000000000000"
+    assert document.backend.document_info(document.tree, document.nsmap) == ("system-security-plan", "1.1.2")
+
+
+def test_xpath_number():
+    assert [xpath_number(value) for value in [3, 3.0, 2.5, True, "3.0"]] == [3, 3, 2.5, True, "3.0"]
+    assert str(xpath_number(float("inf"))) == "inf"
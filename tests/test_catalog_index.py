@@ -0,0 +1,156 @@
+import io
+import json
+import types
+import zlib
+from xml.etree import ElementTree
+
+import pytest
+
+import catalog_index
+from catalog_index import CatalogIndex, CatalogSnapshots, iter_catalog_controls, iter_controls, iter_json_controls
+from common import OSCAL_DEFAULT_NAMESPACE
+from ssp_content_creator import oscal
+from synthetic_catalog import write_synthetic_catalog
+
+NS = "{" + OSCAL_DEFAULT_NAMESPACE + "}"
+
+# Response points that are nested, in a non-statement part, or have the wrong namespace
+CATALOG = """<?xml version="1.0" encoding="UTF-8"?>
+<catalog xmlns="http://csrc.nist.gov/ns/oscal/1.0" uuid="aaaaaaaa-0000-4000-8000-000000000000">
+  <metadata><title>Edge cases</title><oscal-version>1.1.2</oscal-version></metadata>
+  <control id=" ac-1 ">
+    <param id="ac-1_prm_1"/><param id="ac-1_prm_2"/>
+    <part name="statement" id="ac-1_smt">
+      <part name="item" id="ac-1_smt.a">
+        <prop name="response-point" ns="https://fedramp.gov/ns/oscal" value="a"/>
+        <part name="item" id="ac-1_smt.a.1"><prop name="response-point" ns="https://fedramp.gov/ns/oscal" value="1"/></part>
+      </part>
+      <part name="item" id="ac-1_smt.b"><prop name="response-point" ns="https://example.com/ns" value="b"/></part>
+    </part>
+    <part name="guidance" id="ac-1_gdn"><prop name="response-point" ns="https://fedramp.gov/ns/oscal" value="g"/></part>
+    <control id="ac-1.1">
+      <part name="statement" id="ac-1.1_smt"><prop name="response-point" ns="https://fedramp.gov/ns/oscal" value="s"/></part>
+    </control>
+  </control>
+  <group id="ac">
+    <group id="ac-x">
+      <control id="ac-2"><param id="ac-2_prm_1"/><control id="ac-2.1"/><control id="ac-2.2"/></control>
+    </group>
+  </group>
+</catalog>
+"""
+# The per-control queries insert_controls ran before the catalog index
+RESPONSE_POINTS = "./part[@name='statement']//prop[@name='response-point' and @ns='https://fedramp.gov/ns/oscal']/.."
+
+
+class Unseekable(io.BytesIO):
+    def seekable(self):
+        return False
+
+
+def rows(entries):
+    # after the generator is exhausted, so enhancement lists are complete
+    entries = list(entries)
+    return [(entry.id, entry.parent, list(entry.params), list(entry.response_points), list(entry.children)) for entry in entries]
+
+
+@pytest.fixture(params=["groups", "top-level controls"])
+def catalogs(request):
+    """
+    The same catalog as (XML bytes, JSON bytes); optionally with the first
+    group's controls moved to the top level, ahead of the remaining groups.
+    """
+    xml_text = io.StringIO()
+    json_text = io.StringIO()
+    write_synthetic_catalog(xml_text, controls=6, enhancements=2, params=2, response_points=3, controls_per_group=2)
+    write_synthetic_catalog(json_text, controls=6, enhancements=2, params=2, response_points=3, controls_per_group=2, catalog_format="json")
+    xml_root = ElementTree.fromstring(xml_text.getvalue())
+    document = json.loads(json_text.getvalue())
+
+    if request.param == "top-level controls":
+        group = xml_root.find(NS + "group")
+        xml_root.remove(group)
+        for position, control in enumerate(group.findall(NS + "control")):
+            xml_root.insert(1 + position, control)
+        groups = document["catalog"]["groups"]
+        document["catalog"]["controls"] = groups.pop(0)["controls"]
+        # after the groups in the JSON text; the model order still puts them first
+        document["catalog"]["groups"] = document["catalog"].pop("groups")
+
+    ElementTree.register_namespace("", OSCAL_DEFAULT_NAMESPACE)
+    return (ElementTree.tostring(xml_root), json.dumps(document).encode("utf-8"))
+
+
+def test_every_reader_gives_the_same_controls(catalogs):
+    (xml_bytes, json_bytes) = catalogs
+    expected = rows(CatalogIndex(ElementTree.fromstring(xml_bytes)))
+
+    assert len(expected) == 18
+    assert all(len(row[3]) == 3 for row in expected)
+    assert rows(iter_controls(io.BytesIO(xml_bytes))) == expected
+    assert rows(iter_json_controls(io.BytesIO(json_bytes))) == expected
+    assert rows(iter_json_controls(Unseekable(json_bytes))) == expected
+    assert rows(CatalogIndex.from_json(io.BytesIO(json_bytes))) == expected
+    assert rows(iter_catalog_controls(io.BytesIO(json_bytes))) == expected
+
+
+@pytest.mark.parametrize("backend", ["stdlib", "lxml", "saxon"])
+def test_one_pass_matches_the_per_control_queries(backend):
+    pytest.importorskip({"stdlib": "elementpath", "lxml": "lxml", "saxon": "saxonche"}[backend])
+    queries = oscal(CATALOG)
+    expected = []
+    parents = {}
+    for control in queries.xpath("//control"):
+        control_id = control.get("id").strip()
+        children = [child.get("id").strip() for child in queries.xpath("./control", control)]
+        parents.update((child, control_id) for child in children)
+        expected.append((control_id, parents.get(control_id),
+                         [param.get("id") for param in queries.xpath("./param", control)],
+                         [part.get("id") for part in queries.xpath(RESPONSE_POINTS, control)],
+                         children))
+
+    assert expected[0] == ("ac-1", None, ["ac-1_prm_1", "ac-1_prm_2"], ["ac-1_smt.a", "ac-1_smt.a.1"], ["ac-1.1"])
+    assert rows(CatalogIndex.from_oscal(oscal(CATALOG, backend=backend))) == expected
+
+
+def test_without_ijson_the_same_controls(catalogs, monkeypatch):
+    def import_module(name):
+        if name == "ijson":
+            raise ImportError(name)
+        return __import__(name)
+    monkeypatch.setattr(catalog_index, "importlib", types.SimpleNamespace(import_module=import_module))
+    (xml_bytes, json_bytes) = catalogs
+
+    assert rows(iter_json_controls(io.BytesIO(json_bytes))) == rows(iter_controls(io.BytesIO(xml_bytes)))
+
+
+def test_json_model_and_version(catalogs):
+    info = {}
+    list(iter_json_controls(io.BytesIO(catalogs[1]), info))
+
+    assert info == {"oscal_model": "catalog", "oscal_version": "1.1.2"}
+
+
+def test_snapshots_round_trip_as_json(catalogs, tmp_path):
+    (xml_bytes, json_bytes) = catalogs
+    index = CatalogIndex.from_json(io.BytesIO(json_bytes))
+    snapshots = CatalogSnapshots(str(tmp_path))
+
+    assert snapshots.load(xml_bytes) is None
+    assert snapshots.save(xml_bytes, index)
+    (snapshot_file,) = tmp_path.iterdir()
+    data = json.loads(zlib.decompress(snapshot_file.read_bytes()))
+    assert (data["version"], data["oscal_model"]) == (CatalogSnapshots.SNAPSHOT_VERSION, "catalog")
+
+    loaded = snapshots.load(xml_bytes)
+    assert rows(loaded) == rows(index)
+    assert (loaded.oscal_model, loaded.oscal_version) == (index.oscal_model, index.oscal_version)
+
+
+def test_snapshots_ignore_unreadable_files(catalogs, tmp_path):
+    snapshots = CatalogSnapshots(str(tmp_path))
+    snapshots.save(catalogs[0], CatalogIndex.from_json(io.BytesIO(catalogs[1])))
+    (snapshot_file,) = tmp_path.iterdir()
+    snapshot_file.write_bytes(zlib.compress(b"\x80\x04K\x01."))    # a pickle
+
+    assert snapshots.load(catalogs[0]) is None
@@ -0,0 +1,51 @@
+from xml.etree import ElementTree
+
+import pytest
+
+import ssp_content_creator
+from conftest import BASE_SSP
+from common import OSCAL_DEFAULT_NAMESPACE, uuid_format
+from ssp_content_creator import this_system_uuid, uuid_generated_by_component, uuid_generated_component
+
+NS = "{" + OSCAL_DEFAULT_NAMESPACE + "}"
+
+
+def components(file_name):
+    return ElementTree.parse(file_name).getroot().findall(NS + "system-implementation/" + NS + "component")
+
+
+def generated_statements(file_name):
+    requirements = ElementTree.parse(file_name).getroot().findall(NS + "control-implementation/" + NS + "implemented-requirement")
+    return [statement for requirement in requirements if requirement.get("control-id").startswith("g")
+            for statement in requirement.findall(NS + "statement")]
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_components_option(tmp_path, catalog_file, monkeypatch, stream):
+    monkeypatch.chdir(tmp_path)    # for the cache directory
+    monkeypatch.setattr(ssp_content_creator, "configure_logging", lambda *args, **kwargs: [])
+    outputs = [str(tmp_path / name) for name in ["first.xml", "second.xml"]]
+    for output in outputs:
+        argv = ["--catalog", catalog_file, "--base-ssp", BASE_SSP, "--output", output, "--components", "4", "--components-per-statement", "3"]
+        assert ssp_content_creator.main(argv + (["--stream"] if stream else [])) == 0
+
+    with open(outputs[0], mode="rb") as first, open(outputs[1], mode="rb") as second:
+        assert first.read() == second.read()
+
+    component_uuids = [uuid_format(uuid_generated_component + index + 1) for index in range(4)]
+    added = components(outputs[0])[len(components(BASE_SSP)):]
+    assert [component.get("uuid") for component in added] == component_uuids
+    assert [component.find(NS + "title").text for component in added] == ["Component 1", "Component 2", "Component 3", "Component 4"]
+
+    statements = generated_statements(outputs[0])
+    assert len(statements) >= 2
+    by_components = []
+    for statement in statements:
+        found = statement.findall(NS + "by-component")
+        assert len(found) == 1 + 3
+        assert found[0].get("component-uuid") == this_system_uuid
+        by_components += found[1:]
+    assert [by_component.get("uuid") for by_component in by_components] == \
+        [uuid_format(uuid_generated_by_component + index + 1) for index in range(len(by_components))]
+    assert [by_component.get("component-uuid") for by_component in by_components] == \
+        [component_uuids[index % 4] for index in range(len(by_components))]
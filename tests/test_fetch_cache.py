@@ -0,0 +1,106 @@
+import os
+import time
+import types
+
+import pytest
+
+import common
+from common import FetchCache, Fetcher
+from conftest import static
+
+BODY = b'<?xml version="1.0"?><catalog xmlns="http://csrc.nist.gov/ns/oscal/1.0"/>'
+ETAG = '"v1"'
+LAST_MODIFIED = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Replaces the clock used by the cache; advance it by adding to now[0].
+    """
+    now = [time.time()]
+    monkeypatch.setattr(common, "time", types.SimpleNamespace(time=lambda: now[0], sleep=time.sleep, perf_counter=time.perf_counter))
+    return now
+
+
+@pytest.fixture
+def fetcher():
+    with Fetcher(timeout=5, retries=0) as fetcher:
+        yield fetcher
+
+
+def test_stores_validators_and_sends_them(server, tmp_path, fetcher):
+    server.routes["/catalog.xml"] = static(BODY, ETAG, LAST_MODIFIED)
+    cache = FetchCache(str(tmp_path))
+
+    assert fetcher.fetch(server.url("/catalog.xml"), cache) == BODY.decode("utf-8")
+    entry = cache.lookup(server.url("/catalog.xml"))
+    assert (entry["etag"], entry["last_modified"], entry["size"]) == (ETAG, LAST_MODIFIED, len(BODY))
+
+    assert fetcher.fetch(server.url("/catalog.xml"), cache) == BODY.decode("utf-8")
+    headers = server.hits("/catalog.xml")[1][1]
+    assert headers["If-None-Match"] == ETAG
+    assert headers["If-Modified-Since"] == LAST_MODIFIED
+
+
+def test_not_modified_renews_the_fetch_time(server, tmp_path, fetcher, clock):
+    server.routes["/catalog.xml"] = static(BODY, ETAG)
+    cache = FetchCache(str(tmp_path), max_age=60)
+    url = server.url("/catalog.xml")
+
+    fetcher.fetch(url, cache)
+    clock[0] += 120
+    assert not cache.is_fresh(cache.lookup(url))
+
+    # revalidated with a 304; the body comes from the cache
+    assert fetcher.fetch(url, cache) == BODY.decode("utf-8")
+    entry = cache.lookup(url)
+    assert entry["fetched"] == clock[0]
+    assert cache.is_fresh(entry)
+
+    # fresh again, so the server is not asked
+    assert fetcher.fetch(url, cache) == BODY.decode("utf-8")
+    assert len(server.hits("/catalog.xml")) == 2
+
+
+def test_offline_uses_only_the_cache(server, tmp_path, fetcher):
+    server.routes["/catalog.xml"] = static(BODY, ETAG)
+    fetcher.fetch(server.url("/catalog.xml"), FetchCache(str(tmp_path)))
+    offline = FetchCache(str(tmp_path), offline=True)
+
+    assert fetcher.fetch(server.url("/catalog.xml"), offline) == BODY.decode("utf-8")
+    assert fetcher.fetch(server.url("/other.xml"), offline) == ""
+    assert len(server.requests) == 1
+
+
+def test_stale_copy_when_the_server_fails(server, tmp_path, fetcher):
+    server.routes["/catalog.xml"] = static(BODY, ETAG)
+    cache = FetchCache(str(tmp_path))
+    fetcher.fetch(server.url("/catalog.xml"), cache)
+
+    server.routes["/catalog.xml"] = lambda request, count: (500, {}, b"")
+    assert fetcher.fetch(server.url("/catalog.xml"), cache) == BODY.decode("utf-8")
+    assert len(server.hits("/catalog.xml")) == 2
+
+
+def test_max_size_evicts_least_recently_used(tmp_path, clock):
+    cache = FetchCache(str(tmp_path), max_size=1000)
+    cache.store("http://example.test/a", b"a" * 600)
+    clock[0] += 1
+    cache.store("http://example.test/b", b"b" * 600)
+
+    assert cache.lookup("http://example.test/a") is None
+    assert cache.lookup("http://example.test/b") is not None
+    assert len(os.listdir(os.path.join(str(tmp_path), "objects"))) == 1
+
+
+def test_max_unused_evicts_unused_entries(tmp_path, clock):
+    cache = FetchCache(str(tmp_path), max_unused=3600)
+    cache.store("http://example.test/a", b"a")
+    clock[0] += 1800
+    cache.store("http://example.test/b", b"b")
+    clock[0] += 1800 + 1
+    cache.evict()
+
+    assert cache.lookup("http://example.test/a") is None
+    assert cache.lookup("http://example.test/b") is not None
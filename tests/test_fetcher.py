@@ -0,0 +1,126 @@
+import threading
+import time
+
+import pytest
+
+from common import FetchCache, Fetcher
+from conftest import static
+from metrics import RunMetrics
+
+BODY = b'<?xml version="1.0"?><catalog xmlns="http://csrc.nist.gov/ns/oscal/1.0"/>'
+
+
+def flaky(failures, status=503, headers=None):
+    """
+    Returns a route answering status for the first failures requests, then BODY.
+    """
+    def route(request, count):
+        if count <= failures:
+            return (status, headers or {}, b"")
+        return (200, {}, BODY)
+    return route
+
+
+def test_retries_until_the_server_recovers(server):
+    server.routes["/flaky.xml"] = flaky(2)
+    with Fetcher(timeout=5, retries=3, backoff=0.01) as fetcher:
+        assert fetcher.fetch(server.url("/flaky.xml")) == BODY.decode("utf-8")
+    assert len(server.hits("/flaky.xml")) == 3
+
+
+def test_gives_up_after_the_last_retry(server):
+    server.routes["/down.xml"] = flaky(10)
+    with Fetcher(timeout=5, retries=2, backoff=0.01) as fetcher:
+        assert fetcher.fetch(server.url("/down.xml")) == ""
+    assert len(server.hits("/down.xml")) == 3
+
+
+def test_waits_for_retry_after(server):
+    server.routes["/busy.xml"] = flaky(1, status=429, headers={"Retry-After": "1"})
+    with Fetcher(timeout=5, retries=1, backoff=0.01) as fetcher:
+        start = time.perf_counter()
+        assert fetcher.fetch(server.url("/busy.xml")) == BODY.decode("utf-8")
+        assert time.perf_counter() - start >= 1
+
+    # never longer than max_backoff
+    server.routes["/busier.xml"] = flaky(1, status=429, headers={"Retry-After": "60"})
+    with Fetcher(timeout=5, retries=1, backoff=0.01, max_backoff=0.1) as fetcher:
+        start = time.perf_counter()
+        assert fetcher.fetch(server.url("/busier.xml")) == BODY.decode("utf-8")
+        assert time.perf_counter() - start < 5
+
+
+def test_not_found_is_not_retried(server):
+    with Fetcher(timeout=5, retries=3, backoff=0.01) as fetcher:
+        assert fetcher.fetch(server.url("/missing.xml")) == ""
+    assert len(server.hits("/missing.xml")) == 1
+
+
+def test_slow_server_times_out(server):
+    server.routes["/slow.xml"] = static(BODY, delay=1)
+    with Fetcher(timeout=0.2, retries=1, backoff=0.01) as fetcher:
+        start = time.perf_counter()
+        assert fetcher.fetch(server.url("/slow.xml")) == ""
+        assert time.perf_counter() - start < 1.5
+    assert len(server.hits("/slow.xml")) == 2
+
+
+def test_fetch_all_limits_concurrency(server, tmp_path):
+    urls = []
+    for index in range(12):
+        server.routes["/c" + str(index) + ".xml"] = static(BODY, delay=0.1)
+        urls.append(server.url("/c" + str(index) + ".xml"))
+    with Fetcher(timeout=5, retries=0, max_workers=3) as fetcher:
+        results = fetcher.fetch_all(urls + urls[:2], FetchCache(str(tmp_path)))
+
+    assert list(results) == urls
+    assert set(results.values()) == {BODY.decode("utf-8")}
+    assert len(server.requests) == 12
+    assert 1 < server.max_active <= 3
+
+
+def test_connections_are_reused(server):
+    server.routes["/catalog.xml"] = static(BODY)
+    for index in range(6):
+        server.routes["/catalog.xml?" + str(index)] = static(BODY)
+    server.routes["/flaky.xml"] = flaky(2)
+    with Fetcher(timeout=5, retries=2, backoff=0.01, max_workers=2) as fetcher:
+        for index in range(5):
+            fetcher.fetch(server.url("/catalog.xml"))
+        # error responses do not cost a connection either
+        fetcher.fetch(server.url("/flaky.xml"))
+        fetcher.fetch(server.url("/missing.xml"))
+        fetcher.fetch_all([server.url("/catalog.xml?" + str(index)) for index in range(6)])
+
+    ports = set([request[2] for request in server.requests])
+    assert len(server.requests) == 15
+    assert len(ports) <= 2
+
+
+def test_other_threads_are_not_recorded():
+    run = RunMetrics()
+    run.start()
+    entered = threading.Event()
+    leave = threading.Event()
+
+    def worker():
+        with run.phase("worker"):
+            run.count("worker_items")
+            entered.set()
+            leave.wait(5)
+
+    thread = threading.Thread(target=worker)
+    with run.phase("fetch"):
+        thread.start()
+        entered.wait(5)
+        run.count("items")
+    leave.set()
+    thread.join()
+    with run.phase("read"):
+        pass
+    run.stop()
+
+    report = run.report()
+    assert list(report["phases"]) == ["fetch", "read"]
+    assert report["phases"]["fetch"]["counters"] == {"items": 1}
+    assert report["counters"] == {"items": 1}
@@ -0,0 +1,47 @@
+from xml.etree import ElementTree
+
+from conftest import BASE_SSP
+from common import OSCAL_DEFAULT_NAMESPACE
+from ssp_content_creator import generate_ssp
+
+NS = "{" + OSCAL_DEFAULT_NAMESPACE + "}"
+
+
+def canonical(file_name):
+    return ElementTree.canonicalize(from_file=file_name, strip_text=True)
+
+
+def requirement(root, control_id):
+    return root.find(NS + "control-implementation/" + NS + "implemented-requirement[@control-id='" + control_id + "']")
+
+
+def test_incremental_run_matches_a_full_run(tmp_path, catalog_file):
+    full = str(tmp_path / "full.xml")
+    assert generate_ssp(catalog_file, BASE_SSP, full) is not None
+
+    ElementTree.register_namespace("", OSCAL_DEFAULT_NAMESPACE)
+    tree = ElementTree.parse(full)
+    control_implementation = tree.getroot().find(NS + "control-implementation")
+    # the first generated implemented-requirement, the first set-parameter of
+    # another and a statement in the middle of a third
+    control_implementation.remove(requirement(tree.getroot(), "g1-1"))
+    g1_2 = requirement(tree.getroot(), "g1-2")
+    g1_2.remove(g1_2.find(NS + "set-parameter"))
+    g1_1_1 = requirement(tree.getroot(), "g1-1.1")
+    g1_1_1.remove(g1_1_1.findall(NS + "statement")[1])
+    partial = str(tmp_path / "partial.xml")
+    tree.write(partial, xml_declaration=True, encoding="utf-8")
+    assert canonical(partial) != canonical(full)
+
+    updated = str(tmp_path / "updated.xml")
+    assert generate_ssp(catalog_file, partial, updated, incremental=True) is not None
+    assert canonical(updated) == canonical(full)
+
+
+def test_incremental_run_of_a_complete_ssp_changes_nothing(tmp_path, catalog_file):
+    full = str(tmp_path / "full.xml")
+    generate_ssp(catalog_file, BASE_SSP, full)
+    updated = str(tmp_path / "updated.xml")
+    generate_ssp(catalog_file, full, updated, incremental=True)
+
+    assert canonical(updated) == canonical(full)
@@ -0,0 +1,22 @@
+import io
+
+import pytest
+from loguru import logger
+
+from ssp_content_creator import configure_logging
+
+
+def test_only_its_own_sinks_are_replaced():
+    records = io.StringIO()
+    own_sink = logger.add(records, level="INFO", format="{message}")
+    try:
+        (first,) = configure_logging("WARNING", log_file=None)
+        (second,) = configure_logging("ERROR", log_file=None)
+        logger.info("still here")
+
+        assert records.getvalue() == "still here\n"
+        with pytest.raises(ValueError):
+            logger.remove(first)
+        logger.remove(second)
+    finally:
+        logger.remove(own_sink)
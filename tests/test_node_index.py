@@ -0,0 +1,51 @@
+import pytest
+
+from node_index import NodeIndex
+from ssp_content_creator import oscal
+from test_backends import SSP
+
+
+@pytest.fixture(params=["stdlib", "lxml"])
+def ssp(request):
+    if request.param == "lxml":
+        pytest.importorskip("lxml")
+    return oscal(SSP, backend=request.param)
+
+
+def element(ssp, name, **attributes):
+    new = ssp.tree.makeelement("{" + ssp.nsmap[""] + "}" + name, {})
+    for (attribute, value) in attributes.items():
+        new.set(attribute.replace("_", "-"), value)
+    return new
+
+
+def assert_current(ssp):
+    fresh = NodeIndex(ssp.tree)
+    for name in ["ids", "uuids", "control_ids", "paths"]:
+        assert getattr(ssp.index, name) == getattr(fresh, name), name
+
+
+def test_appended_children_are_indexed(ssp):
+    first = ssp.index
+    child = ssp.append_child("control-implementation", "implemented-requirement", attribute_list=[("control-id", "ac-4"), ("uuid", "u-4")])
+    ssp.add_element("control-implementation/implemented-requirement", element(ssp, "remarks", id="r-4"), child)
+
+    assert ssp.index is first
+    assert ssp.find_node("//implemented-requirement[@control-id='ac-4']") is child
+    assert ssp.index.find_all("control-implementation/implemented-requirement")[-1] is child
+    assert_current(ssp)
+
+
+def test_inserted_elements_keep_document_order(ssp):
+    requirements = ssp.index.find_all("control-implementation/implemented-requirement")
+    ssp.add_element("control-implementation", element(ssp, "implemented-requirement", control_id="ac-0", uuid="u-0"),
+                    before_node=requirements[0])
+    ssp.add_element("control-implementation", element(ssp, "implemented-requirement", control_id="ac-2a", uuid="u-2a"),
+                    after_node=requirements[1])
+    ssp.add_element("control-implementation/implemented-requirement", element(ssp, "set-parameter", param_id="ac-1_prm_1"),
+                    requirements[0], ["statement"])
+    ssp.add_elements("control-implementation", [element(ssp, "implemented-requirement", control_id="ac-5", uuid="u-5")])
+
+    found = [requirement.get("control-id") for requirement in ssp.index.find_all("control-implementation/implemented-requirement")]
+    assert found == ["ac-0", "ac-1", "ac-2", "ac-2a", "ac-3", "ac-5"]
+    assert_current(ssp)
@@ -0,0 +1,76 @@
+from xml.etree import ElementTree
+
+import pytest
+
+from catalog_index import ControlEntry
+from common import TAB
+from oscal_backends import get_backend
+from ssp_content_creator import RequirementBuilder, oscal
+from test_backends import SSP
+
+# What the per-control construction (append_params, append_response_points and
+# append_by_component on a new implemented-requirement) built for the control below
+EXPECTED = """
+<implemented-requirement xmlns="http://csrc.nist.gov/ns/oscal/1.0" control-id="ac-2.1" uuid="11111111-2222-4000-8000-012000020000">
+  <set-parameter param-id="ac-2.1_prm_1"><value>placeholder</value></set-parameter>
+  <set-parameter param-id="ac-2.1_prm_2"><value>placeholder</value></set-parameter>
+  <statement statement-id="ac-2.1_smt.a" uuid="11111111-2222-4000-8000-012000020000">
+    <by-component component-uuid="11111111-2222-4000-8000-009000000000" uuid="11111111-2222-4000-8000-012000020001">
+      <description><p>This is the 'this-system' component that must be present for every statement</p></description>
+    </by-component>
+  </statement>
+  <statement statement-id="ac-2.1_smt.b" uuid="11111111-2222-4000-8000-012000020100">
+    <by-component component-uuid="11111111-2222-4000-8000-009000000000" uuid="11111111-2222-4000-8000-012000020101">
+      <description><p>This is the 'this-system' component that must be present for every statement</p></description>
+    </by-component>
+  </statement>
+</implemented-requirement>
+"""
+
+
+def control(control_id, params=2, response_points=2):
+    entry = ControlEntry(control_id)
+    entry.params = [control_id + "_prm_" + str(index + 1) for index in range(params)]
+    entry.response_points = [control_id + "_smt." + "abc"[index] for index in range(response_points)]
+    return entry
+
+
+def canonical(xml_text):
+    return ElementTree.canonicalize(xml_text, strip_text=True, rewrite_prefixes=True)
+
+
+@pytest.fixture(params=["detached", "stdlib", "lxml"])
+def builder(request):
+    """
+    A RequirementBuilder and the backend to serialize its elements with.
+    """
+    if request.param == "detached":
+        return (RequirementBuilder(), get_backend("stdlib"))
+    if request.param == "lxml":
+        pytest.importorskip("lxml")
+    ssp = oscal(SSP, backend=request.param)
+    return (RequirementBuilder(ssp.index.find("control-implementation")), ssp.backend)
+
+
+def test_matches_the_per_control_construction(builder):
+    (builder, backend) = builder
+    implemented_requirement = builder.implemented_requirement(control("ac-2.1"), 12000020000)
+
+    assert canonical(backend.to_string(implemented_requirement, TAB)) == canonical(EXPECTED)
+
+
+def test_build_all_matches_one_at_a_time(builder):
+    (builder, backend) = builder
+    selected = [(control("ac-1", 1, 3), 12000010000), (control("ac-2", 0, 0), 12000020000), (control("ac-2.1"), 12000030000)]
+
+    built = [canonical(backend.to_string(element, TAB)) for element in builder.build_all(selected)]
+    one_at_a_time = [canonical(backend.to_string(builder.implemented_requirement(entry, uuid_cntr), TAB)) for (entry, uuid_cntr) in selected]
+    assert built == one_at_a_time
+
+
+def test_copies_do_not_share_children(builder):
+    (builder, backend) = builder
+    first = builder.implemented_requirement(control("ac-2.1"), 12000020000)
+    builder.implemented_requirement(control("ac-3"), 12000030000)[0][0].text = "changed"
+
+    assert canonical(backend.to_string(first, TAB)) == canonical(EXPECTED)
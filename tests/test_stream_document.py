@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+from ssp_content_creator import stream_document
+
+EXISTING = {"uuid": "11111111-2222-4000-8000-000000000001", "control-id": "ac-1", "statements": []}
+
+
+def base_ssp(requirements):
+    return {"system-security-plan": {"uuid": "11111111-2222-4000-8000-000000000000",
+                                     "control-implementation": {"description": "", "implemented-requirements": requirements}}}
+
+
+@pytest.mark.parametrize("output_format", ["json", "yaml"])
+def test_no_requirements_creates_no_file(tmp_path, output_format):
+    if output_format == "yaml":
+        pytest.importorskip("yaml")
+    output = tmp_path / ("ssp." + output_format)
+
+    assert stream_document([], base_ssp([]), str(output), output_format) is False
+    assert not output.exists()
+
+
+def test_existing_requirements_are_kept(tmp_path):
+    output = tmp_path / "ssp.json"
+
+    assert stream_document([], base_ssp([EXISTING]), str(output)) is True
+    assert json.loads(output.read_text()) == base_ssp([EXISTING])
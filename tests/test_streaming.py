@@ -0,0 +1,55 @@
+import re
+from xml.etree import ElementTree
+
+import pytest
+
+from conftest import BASE_SSP
+from common import OSCAL_DEFAULT_NAMESPACE
+from ssp_content_creator import generate_ssp, stream_controls, streamable_ssp
+
+
+def canonical(file_name):
+    # The same for any prefix (or none) the file uses for a namespace
+    return ElementTree.canonicalize(from_file=file_name, strip_text=True, rewrite_prefixes=True)
+
+
+def prefixed_base_ssp(tmp_path):
+    with open(BASE_SSP, encoding="utf-8") as file:
+        content = file.read()
+    content = content.replace('xmlns="' + OSCAL_DEFAULT_NAMESPACE + '"', 'xmlns:o="' + OSCAL_DEFAULT_NAMESPACE + '"', 1)
+    content = re.sub(r"<(/?)(?=[A-Za-z])", r"<\1o:", content)
+    file_name = tmp_path / "prefixed.xml"
+    file_name.write_text(content, encoding="utf-8")
+    return str(file_name)
+
+
+@pytest.mark.parametrize("backend", ["stdlib", "lxml"])
+@pytest.mark.parametrize("components", [0, 3])
+def test_streamed_output_matches_in_memory_output(tmp_path, catalog_file, backend, components):
+    if backend == "lxml":
+        pytest.importorskip("lxml")
+    in_memory = str(tmp_path / "in_memory.xml")
+    streamed = str(tmp_path / "streamed.xml")
+
+    assert generate_ssp(catalog_file, BASE_SSP, in_memory, backend=backend, components=components, components_per_statement=2) is not None
+    assert generate_ssp(catalog_file, BASE_SSP, streamed, stream=True, backend=backend, components=components, components_per_statement=2) is True
+    assert canonical(streamed) == canonical(in_memory)
+
+
+def test_prefixed_base_ssp_is_generated_in_memory(tmp_path, catalog_file):
+    base_ssp = prefixed_base_ssp(tmp_path)
+    in_memory = str(tmp_path / "in_memory.xml")
+    streamed = str(tmp_path / "streamed.xml")
+
+    assert not streamable_ssp(open(base_ssp, encoding="utf-8").read())
+    assert streamable_ssp(open(BASE_SSP, encoding="utf-8").read())
+    assert generate_ssp(catalog_file, BASE_SSP, in_memory) is not None
+    assert generate_ssp(catalog_file, base_ssp, streamed, stream=True) is not None
+    assert canonical(streamed) == canonical(in_memory)
+
+
+def test_stream_controls_refuses_a_prefixed_base_ssp(tmp_path, catalog_file):
+    output = tmp_path / "streamed.xml"
+    with open(prefixed_base_ssp(tmp_path), encoding="utf-8") as file:
+        assert stream_controls(catalog_file, file.read(), str(output)) is False
+    assert not output.exists()
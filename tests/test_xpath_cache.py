@@ -0,0 +1,55 @@
+from oscal_backends import XPathCache, get_backend
+from ssp_content_creator import oscal
+
+CATALOG = """<?xml version="1.0" encoding="UTF-8"?>
+<catalog xmlns="http://csrc.nist.gov/ns/oscal/1.0" uuid="aaaaaaaa-0000-4000-8000-000000000000">
+  <control id="ac-1"><param id="ac-1_prm_1"/></control>
+  <control id="ac-2"/>
+</catalog>
+"""
+
+
+def test_counts_hits_and_misses():
+    cache = XPathCache()
+    first = cache.selector("//control")
+    assert cache.selector("//control") is first
+    cache.selector("//param")
+
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert cache.stats() == {"hits": 1, "misses": 2, "size": 2, "maxsize": 256}
+
+
+def test_keyed_by_namespace_map_and_backend():
+    cache = XPathCache()
+    cache.selector("//control", {"": "urn:a"})
+    cache.selector("//control", {"": "urn:b"})
+    cache.selector("//control", {"": "urn:a"}, get_backend("stdlib"))
+
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_evicts_the_least_recently_used():
+    cache = XPathCache(maxsize=2)
+    a = cache.selector("//a")
+    cache.selector("//b")
+    cache.selector("//a")     # //b is now the least recently used
+    cache.selector("//c")
+
+    assert cache.stats()["size"] == 2
+    assert cache.selector("//a") is a
+    assert cache.misses == 3
+    cache.selector("//b")
+    assert cache.misses == 4
+
+
+def test_oscal_queries_use_the_cache():
+    cache = XPathCache()
+    document = oscal(CATALOG, xpath_cache=cache)
+    for control in document.xpath("//control"):
+        document.xpath_atomic("./@id", control)
+
+    assert document.xpath_atomic("count(//control)") == "2"
+    assert (cache.hits, cache.misses) == (1, 3)
+
+    cache.clear()
+    assert cache.stats() == {"hits": 0, "misses": 0, "size": 0, "maxsize": 256}